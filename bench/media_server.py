@@ -0,0 +1,246 @@
+"""
+Local stand-in for YouTube used by the benchmark suite.
+
+Serves synthetic media and the metadata the bench extractor (yt_dlp_plugins/extractor/bench_media.py)
+turns into yt-dlp info dicts. Every response can be slowed down with a per-connection bandwidth
+cap and a first-byte latency, so runs are repeatable without touching the network. With a
+rate_limit, video metadata and media requests beyond that many per second get HTTP 429 with a
+Retry-After, the way YouTube answers a client that asks too fast.
+
+    /api/video/<id>.json         video metadata (formats, thumbnails, duration)
+    /api/playlist/<count>.json   flat playlist of <count> videos (?page=N: PLAYLIST_PAGE entries at a time)
+    /media/<id>.wav              synthetic PCM audio (valid input for ffmpeg), Range supported
+    /media/<id>.mp4              opaque bytes for the progressive video format, Range supported
+    /thumb/<id>_<w>x<h>.jpg      generated JPEG thumbnail
+"""
+import io
+import json
+import math
+import re
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+WRITE_SIZE = 16 * 1024
+# Entries per /api/playlist page, roughly what one YouTube continuation returns
+PLAYLIST_PAGE = 100
+
+
+def synth_wav(seconds):
+    """ 16-bit stereo sine sweep with a WAV header; cheap to build and decodes everywhere. """
+    frames = int(SAMPLE_RATE * seconds)
+    one_second = bytearray()
+    for i in range(SAMPLE_RATE):
+        sample = int(12000 * math.sin(2 * math.pi * (220 + (i % 800)) * i / SAMPLE_RATE))
+        one_second += struct.pack("<hh", sample, sample)
+    data = bytes(one_second) * int(math.ceil(seconds))
+    data = data[:frames * CHANNELS * 2]
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(data), b"WAVE", b"fmt ", 16, 1, CHANNELS,
+                         SAMPLE_RATE, SAMPLE_RATE * CHANNELS * 2, CHANNELS * 2, 16, b"data", len(data))
+    return header + data
+
+
+def synth_jpeg(width, height):
+    from PIL import Image
+
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class MediaServer:
+    """
+    Threaded HTTP server on 127.0.0.1. Use as a context manager:
+
+        with MediaServer(bandwidth=2_000_000, latency=0.05) as server:
+            url = server.playlist_url(50)
+    """
+
+    def __init__(self, bandwidth=None, latency=0.0, track_seconds=20, video_bytes=8 * 1024 * 1024, port=0,
+                 rate_limit=None):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.recent = []  # start times of the rate-limited requests of the last second
+        self.throttled = 0
+        self.track_seconds = track_seconds
+        self.video_bytes = video_bytes
+        self.bytes_served = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self.httpd.handle_error = self._handle_error
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _handle_error(self, request, client_address):
+        # Clients hanging up (a cancelled or throttled download) is not worth a traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            ThreadingHTTPServer.handle_error(self.httpd, request, client_address)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def video_url(self, video_id):
+        return f"{self.base_url}/watch/{video_id}"
+
+    def playlist_url(self, count):
+        return f"{self.base_url}/playlist/{count}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def over_limit(self):
+        """ True when a rate-limited request would exceed rate_limit requests per second. """
+        if not self.rate_limit: return False
+        with self.lock:
+            now = time.time()
+            self.recent = [t for t in self.recent if now - t < 1.0]
+            if len(self.recent) >= self.rate_limit:
+                self.throttled += 1
+                return True
+            self.recent.append(now)
+            return False
+
+    def blob(self, key, build):
+        with self.lock:
+            if key not in self.blobs:
+                self.blobs[key] = build()
+            return self.blobs[key]
+
+    def video_meta(self, video_id):
+        base = self.base_url
+        audio = self.blob("wav", lambda: synth_wav(self.track_seconds))
+        return {
+            "id": video_id,
+            "title": f"Bench Artist - Track {video_id} (Official Video) [4K]",
+            "duration": self.track_seconds,
+            "thumbnails": [{"url": f"{base}/thumb/{video_id}_{w}x{h}.jpg", "width": w, "height": h}
+                           for w, h in ((120, 90), (320, 180), (480, 360), (1280, 720))],
+            "formats": [
+                {"format_id": "audio", "url": f"{base}/media/{video_id}.wav", "ext": "wav",
+                 "acodec": "pcm_s16le", "vcodec": "none", "filesize": len(audio), "abr": 1411},
+                {"format_id": "video", "url": f"{base}/media/{video_id}.mp4", "ext": "mp4",
+                 "acodec": "aac", "vcodec": "avc1", "height": 720, "width": 1280, "filesize": self.video_bytes},
+            ],
+        }
+
+    def playlist_meta(self, count, page=None):
+        """ Whole playlist, or one page of it with a has_more flag (like YouTube's continuations). """
+        first, last = 1, count
+        if page is not None:
+            first = (page - 1) * PLAYLIST_PAGE + 1
+            last = min(count, page * PLAYLIST_PAGE)
+        meta = {
+            "id": f"bench{count}",
+            "title": f"Bench Playlist {count}",
+            "entries": [{"id": f"v{i:05d}", "title": f"Bench Artist - Track v{i:05d} (Official Video) [4K]",
+                         "url": self.video_url(f"v{i:05d}"), "duration": self.track_seconds,
+                         # Flat YouTube entries carry thumbnails too (the album cover fallback uses them)
+                         "thumbnails": [{"url": f"{self.base_url}/thumb/v{i:05d}_480x360.jpg",
+                                         "width": 480, "height": 360}]}
+                        for i in range(first, last + 1)],
+        }
+        if page is not None:
+            meta["has_more"] = last < count
+        return meta
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                path, _, query = self.path.partition("?")
+                if re.match(r"^/(api/video|media)/", path) and server.over_limit():
+                    return self.send_throttled()
+                match = re.match(r"^/api/video/([\w-]+)\.json$", path)
+                if match:
+                    return self.send_json(server.video_meta(match.group(1)))
+                match = re.match(r"^/api/playlist/(\d+)\.json$", path)
+                if match:
+                    page = re.search(r"(?:^|&)page=(\d+)", query)
+                    return self.send_json(server.playlist_meta(int(match.group(1)), int(page.group(1)) if page else None))
+                match = re.match(r"^/media/[\w-]+\.(wav|mp4)$", path)
+                if match:
+                    if match.group(1) == "wav":
+                        return self.send_blob(server.blob("wav", lambda: synth_wav(server.track_seconds)), "audio/wav")
+                    return self.send_blob(server.blob("mp4", lambda: bytes(server.video_bytes)), "video/mp4")
+                match = re.match(r"^/thumb/[\w-]+_(\d+)x(\d+)\.jpg$", path)
+                if match:
+                    w, h = int(match.group(1)), int(match.group(2))
+                    return self.send_blob(server.blob(f"jpg{w}x{h}", lambda: synth_jpeg(w, h)), "image/jpeg")
+                self.send_error(404)
+
+            def send_throttled(self):
+                body = b"Too Many Requests"
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_json(self, data):
+                self.send_blob(json.dumps(data).encode("utf-8"), "application/json")
+
+            def send_blob(self, data, content_type):
+                start, end = 0, len(data) - 1
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2) or end), len(data) - 1)
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                self.write_throttled(memoryview(data)[start:end + 1])
+
+            def write_throttled(self, view):
+                started = time.time()
+                sent = 0
+                try:
+                    while sent < len(view):
+                        chunk = view[sent:sent + WRITE_SIZE]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if server.bandwidth:
+                            ahead = sent / server.bandwidth - (time.time() - started)
+                            if ahead > 0: time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                with server.lock:
+                    server.bytes_served += sent
+
+        return Handler
@@ -0,0 +1,302 @@
+"""
+Offline benchmark suite. Runs entirely against bench/media_server.py, never against YouTube.
+
+    python bench/run_benchmarks.py --output bench_results.json
+    python bench/run_benchmarks.py --only titles,tagging --titles 50000
+
+Benchmarks:
+    titles        TitleNormalizer over a synthetic corpus of dirty titles, per title, as one batch and with feat. normalized
+    tagging       AlbumTagger.tag_many (the album tagging pass) per-track cost, with cover art
+    preview       paste-to-preview latency (InfoCache + ThumbnailLoader), cold and warm
+    playlist      large playlist: first page (PlaylistStream) vs. full flat extraction
+    download      end-to-end run_download through the real app: single video (per connection count), MP3,
+                  album playlist
+
+The download benchmarks drive a hidden DownloaderApp window, so they need a display
+(use xvfb-run on Linux CI) and bin/ffmpeg.exe next to downloader.py; they report
+"skipped" otherwise. Results are printed (and optionally written) as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# bench/ first so yt-dlp loads the bench extractor plugin; src/ for the app itself
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(1, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+import downloader  # noqa: E402
+import engine  # noqa: E402
+from media_server import MediaServer, synth_jpeg  # noqa: E402
+
+NOISE = ["(Official Video)", "[Official Music Video]", "(Lyrics)", "[4K]", "(HD)", "(Visualizer)",
+         "[HQ Audio]", "(Lyric Video)", "", "", ""]
+# Featured artists, also followed by a separator and more title ("ft. X - Remix")
+FEATS = ["ft. Guest", "(feat. Guest)", "featuring Guest Two - Remix", "ft. Jay-Z | Live", "feat. Guest / Acoustic",
+         "", "", "", ""]
+WORDS = ["midnight", "river", "golden", "echo", "paper", "neon", "summer", "ghost", "signal", "blue"]
+
+
+def title_corpus(count, artist, seed=1):
+    rng = random.Random(seed)
+    titles = []
+    for i in range(count):
+        song = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 4)))
+        prefix = f"{i % 100:02d}-" if rng.random() < 0.3 else ""
+        lead = f"{artist} - " if rng.random() < 0.6 else ""
+        titles.append(f"{prefix}{lead}{song} {rng.choice(FEATS)} {rng.choice(NOISE)} {rng.choice(NOISE)}".strip())
+    return titles
+
+
+def result(name, metric, value, unit, **params):
+    return {"name": name, "metric": metric, "value": round(value, 6), "unit": unit, "params": params}
+
+
+def skipped(name, reason):
+    return {"name": name, "skipped": reason}
+
+
+def bench_titles(args):
+    artist = "Bench Artist"
+    titles = title_corpus(args.titles, artist)
+    normalizer = engine.TitleNormalizer()
+    started = time.perf_counter()
+    for title in titles:
+        normalizer.clean(title, artist)
+    elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    normalizer.clean_many(titles, artist)
+    batch = time.perf_counter() - started
+    # The same corpus with the "feat." rewrite on
+    normalizer = engine.TitleNormalizer({"feat": "normalize"})
+    started = time.perf_counter()
+    normalizer.clean_many(titles, artist)
+    feat = time.perf_counter() - started
+    return [result("titles", "titles_per_second", len(titles) / elapsed, "1/s", titles=len(titles)),
+            result("titles", "total_time", elapsed, "s", titles=len(titles)),
+            result("titles", "batch_titles_per_second", len(titles) / batch, "1/s", titles=len(titles)),
+            result("titles", "feat_normalize_titles_per_second", len(titles) / feat, "1/s", titles=len(titles))]
+
+
+def bench_tagging(args):
+    folder = tempfile.mkdtemp(prefix="bench_tag_")
+    try:
+        cover = os.path.join(folder, "cover.jpg")
+        with open(cover, "wb") as f:
+            f.write(synth_jpeg(1400, 1400))
+        # MPEG-1 Layer III frame header followed by silence; tagging never decodes audio
+        frame = b"\xff\xfb\x90\x64" + bytes(413)
+        jobs = []
+        for i in range(1, args.tag_files + 1):
+            path = os.path.join(folder, f"{i:03d}-Bench Artist - Track {i}.mp3")
+            with open(path, "wb") as f:
+                f.write(frame * 200)
+            jobs.append((path, f"Track {i}", f"{i:03d}", os.path.join(folder, f"{i:03d}-Track {i}.mp3")))
+
+        tagger = engine.AlbumTagger("Bench Artist", "Bench Album", "2024", cover)
+        started = time.perf_counter()
+        tagger.tag_many(jobs)
+        elapsed = time.perf_counter() - started
+        return [result("tagging", "per_track", elapsed / len(jobs) * 1000, "ms", files=len(jobs),
+                       cover_bytes=len(tagger.cover_data or b"")),
+                result("tagging", "total_time", elapsed, "s", files=len(jobs))]
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def bench_preview(args, server):
+    cache = engine.InfoCache()
+    loader = downloader.ThumbnailLoader()
+    links = [server.video_url(f"p{i:03d}") for i in range(args.previews)]
+
+    def load(url):
+        info = cache.get_or_extract(url)
+        thumb_url = loader.pick_thumbnail(info)
+        loader.get_image(thumb_url)
+
+    timings = {}
+    for phase in ("cold", "warm"):
+        samples = []
+        for url in links:
+            started = time.perf_counter()
+            load(url)
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        timings[phase] = samples
+
+    return [result("preview", f"{phase}_{stat}", value * 1000, "ms", links=len(links))
+            for phase, samples in timings.items()
+            for stat, value in (("median", samples[len(samples) // 2]),
+                                ("p95", samples[min(len(samples) - 1, int(len(samples) * 0.95))]))]
+
+
+def bench_playlist(args, server):
+    url = server.playlist_url(args.playlist_size)
+
+    started = time.perf_counter()
+    with engine.InfoCache().stream(url) as stream:
+        next(stream.pages(), None)
+        first_page = time.perf_counter() - started
+        total = stream.count_entries()
+    scan = time.perf_counter() - started
+
+    started = time.perf_counter()
+    engine.InfoCache().get_or_extract(url)
+    full = time.perf_counter() - started
+
+    return [result("playlist", "first_page", first_page * 1000, "ms", entries=total),
+            result("playlist", "stream_all", scan, "s", entries=total),
+            result("playlist", "full_extract", full, "s", entries=total)]
+
+
+def open_hidden_app():
+    try:
+        app = downloader.DownloaderApp()
+    except Exception as e:  # no display
+        return None, f"cannot open a window: {e}"
+    app.withdraw()
+    return app, None
+
+
+def drive_download(server, url, form, settings):
+    """ Queues one download through the app's START button and waits until the queue is idle. """
+    # Keep the app's settings, queue and caches away from the real user profile
+    app_data = tempfile.mkdtemp(prefix="bench_appdata_")
+    previous_app_data = os.environ.get("APPDATA")
+    os.environ["APPDATA"] = app_data
+
+    app, error = open_hidden_app()
+    base_folder = tempfile.mkdtemp(prefix="bench_dl_")
+    try:
+        if not app:
+            return None, error
+
+        # The engine and queue are built on the app's warm-up thread
+        if not app.wait_for_engine():
+            return None, "download engine failed to load"
+        app.settings.update({"info_cache_disk": False, **settings})
+        app.engine.info_cache = engine.InfoCache()
+        app.engine.media_index = None
+        app.runner.set_slots(app.settings["simultaneous_jobs"])
+        # Answer the "folder exists" prompt instead of showing it
+        app.ask_overwrite = lambda folder_name: True
+
+        app.entry_url.insert(0, url)
+        app.entry_folder.delete(0, "end")
+        app.entry_folder.insert(0, base_folder)
+        app.tab_view.set(form["tab"])
+        if form["tab"] == "Standard Download":
+            app.opt_format.set(form["format"])
+            app.update_quality_options(form["format"])
+            app.opt_quality.set(form["quality"])
+        else:
+            app.entry_artist.insert(0, "Bench Artist")
+            app.entry_album.insert(0, "Bench Album")
+            app.entry_year.insert(0, "2024")
+            app.opt_album_quality.set(form["quality"])
+
+        served_before = server.bytes_served
+        started = time.perf_counter()
+        app.start_thread()
+        while app.runner.busy():
+            app.update()
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        app.update()
+
+        files = [f for _, _, names in os.walk(base_folder) for f in names if not f.startswith(".")]
+        return {"elapsed": elapsed, "bytes": server.bytes_served - served_before, "files": len(files),
+                "status": app.lbl_status.cget("text")}, None
+    finally:
+        if app: app.destroy()
+        if previous_app_data is None:
+            os.environ.pop("APPDATA", None)
+        else:
+            os.environ["APPDATA"] = previous_app_data
+        shutil.rmtree(base_folder, ignore_errors=True)
+        shutil.rmtree(app_data, ignore_errors=True)
+
+
+def bench_download(args, server):
+    if not os.path.exists(engine.get_bin_path("ffmpeg.exe")):
+        return [skipped("download", f"ffmpeg not found at {engine.get_bin_path('ffmpeg.exe')}")]
+
+    cases = [(f"download_single_video_c{connections}", server.video_url("single"),
+              {"tab": "Standard Download", "format": "Video (MP4)", "quality": "720p"},
+              {"stream_connections": connections}) for connections in args.connections]
+    cases += [
+        ("download_single_mp3", server.video_url("single"),
+         {"tab": "Standard Download", "format": "Audio Only", "quality": "192kbps"}, {}),
+    ]
+    for workers in args.workers:
+        cases.append((f"download_album_w{workers}", server.playlist_url(args.tracks),
+                      {"tab": "Music Album Maker", "quality": "192kbps"}, {"parallel_downloads": workers}))
+
+    results = []
+    for name, url, form, settings in cases:
+        run, error = drive_download(server, url, form, settings)
+        if not run:
+            results.append(skipped(name, error))
+            continue
+        results += [result(name, "wall_time", run["elapsed"], "s", files=run["files"], status=run["status"],
+                           **settings),
+                    result(name, "throughput", run["bytes"] / run["elapsed"], "B/s", **settings)]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="titles,tagging,preview,playlist,download",
+                        help="comma separated subset of benchmarks to run")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--bandwidth", type=int, default=0, help="per-connection bytes/s cap (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.0, help="first-byte latency per request, seconds")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="video/media requests per second before the server answers 429 (0 = unlimited)")
+    parser.add_argument("--track-seconds", type=int, default=20, help="length of each synthetic track")
+    parser.add_argument("--tracks", type=int, default=50, help="playlist size for the album benchmark")
+    parser.add_argument("--workers", default="1,4", help="parallel_downloads values to compare")
+    parser.add_argument("--connections", default="1,8", help="stream_connections values to compare (video)")
+    parser.add_argument("--video-mb", type=int, default=32, help="size of the progressive video stream, MiB")
+    parser.add_argument("--titles", type=int, default=20000, help="titles in the title cleaning corpus")
+    parser.add_argument("--tag-files", type=int, default=200, help="files in the tagging benchmark")
+    parser.add_argument("--previews", type=int, default=20, help="links in the preview benchmark")
+    parser.add_argument("--playlist-size", type=int, default=2000, help="entries in the playlist benchmark")
+    args = parser.parse_args()
+    args.workers = [int(w) for w in args.workers.split(",") if w]
+    args.connections = [int(c) for c in args.connections.split(",") if c]
+    selected = {name.strip() for name in args.only.split(",")}
+
+    report = {
+        "suite": "universal-youtube-downloader",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "only")},
+        "results": [],
+    }
+
+    with MediaServer(bandwidth=args.bandwidth or None, latency=args.latency,
+                     track_seconds=args.track_seconds, video_bytes=args.video_mb * 1024 * 1024,
+                     rate_limit=args.rate_limit or None) as server:
+        if "titles" in selected: report["results"] += bench_titles(args)
+        if "tagging" in selected: report["results"] += bench_tagging(args)
+        if "preview" in selected: report["results"] += bench_preview(args, server)
+        if "playlist" in selected: report["results"] += bench_playlist(args, server)
+        if "download" in selected: report["results"] += bench_download(args, server)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+yt-dlp extractors for the benchmark media server (bench/media_server.py).
+
+yt-dlp picks this up as a plugin when the bench/ folder is on sys.path, so every YoutubeDL the
+app creates can resolve http://127.0.0.1:<port>/watch/<id> and /playlist/<count> links.
+"""
+import itertools
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchVideoIE(InfoExtractor):
+    IE_NAME = 'bench:video'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/watch/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        base, video_id = self._match_valid_url(url).group('base', 'id')
+        return self._download_json(f'{base}/api/video/{video_id}.json', video_id, note=False)
+
+
+class BenchPlaylistIE(InfoExtractor):
+    IE_NAME = 'bench:playlist'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/playlist/(?P<id>\d+)'
+
+    def _real_extract(self, url):
+        base, count = self._match_valid_url(url).group('base', 'id')
+        first = self._fetch_page(base, count, 1)
+        return self.playlist_result(self._entries(base, count, first), first['id'], first['title'])
+
+    def _fetch_page(self, base, count, page):
+        return self._download_json(f'{base}/api/playlist/{count}.json', count, note=False, query={'page': page})
+
+    def _entries(self, base, count, data):
+        # Pages after the first are only requested as the entries are consumed, as with YouTube playlists
+        for page in itertools.count(2):
+            for e in data['entries']:
+                yield self.url_result(e['url'], BenchVideoIE, e['id'], e['title'], thumbnails=e.get('thumbnails'),
+                                      duration=e.get('duration'))
+            if not data.get('has_more'): return
+            data = self._fetch_page(base, count, page)
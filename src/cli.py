@@ -0,0 +1,191 @@
+"""
+Batch mode: runs a file of links through the download engine without opening a window.
+
+    python cli.py links.txt -o /srv/music --mode audio --quality 320 --jobs 4
+
+Each non-empty line of the batch file (use - for stdin) is either a plain URL, downloaded with the
+--mode/--quality/--output defaults, or a JSON object with DownloadJob fields for that one line:
+
+    https://www.youtube.com/watch?v=dQw4w9WgXcQ
+    {"url": "https://www.youtube.com/playlist?list=...", "mode": "album", "artist": "Artist", "album": "Album", "year": "2020"}
+
+Lines starting with # are ignored. Progress goes to stderr; the results are written as JSON to
+stdout (or --results FILE), with the playlist entries that still failed after their retries listed
+under each job's failed_entries. Exit code: 0 when every job finished or was skipped, 1 when any job
+failed or lost entries, 2 for a bad batch file, 130 when interrupted.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.utils import format_bytes, formatSeconds
+
+from config import SETTINGS_FIELDS, get_bin_path, load_settings, choice_label
+from engine import CancelToken, DownloadEngine, DownloadJob, MetricsExporter, RunEvents
+
+
+# --- HELPER CLASS: Console side of a download run ---
+class ConsoleRunEvents(RunEvents):
+    """ Prints status changes of one job to stderr, prefixed with its line number. """
+
+    lock = threading.Lock()
+
+    # Seconds between whole-job estimate lines
+    ESTIMATE_INTERVAL = 15
+
+    def __init__(self, label, verbose=True):
+        self.label = label
+        self.verbose = verbose
+        self.last_status = None
+        self.last_estimate = 0
+
+    def status(self, text, level=None):
+        # Per-chunk download statuses would flood the log; only changes of state are printed
+        if not self.verbose or text.startswith("Downloading:") or text == self.last_status: return
+        self.last_status = text
+        with self.lock:
+            print(f"[{self.label}] {text}", file=sys.stderr, flush=True)
+
+    def estimate(self, done_bytes, total_bytes, speed, eta):
+        now = time.time()
+        if not self.verbose or not total_bytes or now - self.last_estimate < self.ESTIMATE_INTERVAL: return
+        self.last_estimate = now
+        eta_text = formatSeconds(int(eta)) if eta is not None else "unknown"
+        with self.lock:
+            print(f"[{self.label}] {format_bytes(done_bytes)} of ~{format_bytes(total_bytes)} "
+                  f"at {format_bytes(speed)}/s, ETA {eta_text}", file=sys.stderr, flush=True)
+
+
+def parse_setting(text):
+    """ 'key=value' from --set, with value given the way the Settings popup shows it (On/Off, numbers). """
+    key, _, value = text.partition("=")
+    fields = {k: choices for k, _, choices in SETTINGS_FIELDS}
+    if key not in fields:
+        raise argparse.ArgumentTypeError(f"unknown setting '{key}' (known: {', '.join(fields)})")
+    lookup = {choice_label(c).lower(): c for c in fields[key]}
+    if value.lower() not in lookup:
+        raise argparse.ArgumentTypeError(f"{key} must be one of: {', '.join(choice_label(c) for c in fields[key])}")
+    return key, lookup[value.lower()]
+
+
+def read_batch(path, defaults):
+    """ Parses the batch file into DownloadJobs. Raises ValueError naming the offending line. """
+    handle = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    jobs = []
+    with handle:
+        for number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith("#"): continue
+            try:
+                if line.startswith("{"):
+                    jobs.append(DownloadJob.from_dict(json.loads(line), **defaults))
+                else:
+                    jobs.append(DownloadJob(line, **defaults))
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"line {number}: {e}")
+    return jobs
+
+
+def find_ffmpeg(path=None):
+    """ --ffmpeg, else the bundled bin/ffmpeg.exe, else ffmpeg on PATH. """
+    if path: return path
+    bundled = get_bin_path("ffmpeg.exe")
+    if os.path.exists(bundled): return bundled
+    return shutil.which("ffmpeg")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("batch", help="file with one URL or JSON job per line, - for stdin")
+    parser.add_argument("-o", "--output", default=os.getcwd(), help="base download folder (default: current folder)")
+    parser.add_argument("--mode", choices=DownloadJob.MODES, default="video", help="default mode for plain URL lines")
+    parser.add_argument("--quality", help="default video height or audio bitrate (e.g. 720, 320)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="batch lines downloaded at the same time")
+    parser.add_argument("--set", dest="overrides", type=parse_setting, action="append", default=[],
+                        metavar="KEY=VALUE", help="override an app setting, e.g. --set parallel_downloads=4")
+    parser.add_argument("--on-exists", choices=("merge", "skip"), default="merge",
+                        help="what to do when the target folder already exists")
+    parser.add_argument("--ffmpeg", help="path to the ffmpeg binary")
+    parser.add_argument("--title-rules", help="title cleanup rules JSON (default: title_rules.json in the app data folder)")
+    parser.add_argument("--results", help="write the JSON results here instead of stdout")
+    parser.add_argument("--metrics-jsonl", help="append every job's result and stage metrics to this JSON lines file")
+    parser.add_argument("--metrics-prom", help="write running totals to this Prometheus text file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    args = parser.parse_args(argv)
+
+    defaults = {"folder": os.path.abspath(args.output), "mode": args.mode, "quality": args.quality,
+                "overwrite": args.on_exists == "merge"}
+    try:
+        jobs = read_batch(args.batch, defaults)
+    except (OSError, ValueError) as e:
+        print(f"Batch Error: {e}", file=sys.stderr)
+        return 2
+
+    ffmpeg_path = find_ffmpeg(args.ffmpeg)
+    if not ffmpeg_path:
+        print("Error: ffmpeg not found (use --ffmpeg)", file=sys.stderr)
+        return 2
+
+    settings = load_settings()
+    settings.update(dict(args.overrides))
+    exporter = None
+    if args.metrics_jsonl or args.metrics_prom:
+        exporter = MetricsExporter(args.metrics_jsonl, args.metrics_prom)
+    # yt-dlp's own console output would interleave with the results on stdout
+    engine = DownloadEngine.from_settings(settings, ffmpeg_path=ffmpeg_path, title_rules=args.title_rules,
+                                          ydl_params={'quiet': True, 'noprogress': True},
+                                          metrics_exporter=exporter)
+
+    tokens = [CancelToken() for _ in jobs]
+    started = time.time()
+    # stdout is reserved for the results; the engine's diagnostics go to stderr with the progress
+    results_out, sys.stdout = sys.stdout, sys.stderr
+
+    def run(number):
+        events = ConsoleRunEvents(f"{number + 1}/{len(jobs)}", verbose=not args.quiet)
+        return engine.run(jobs[number], events, tokens[number])
+
+    interrupted = False
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        futures = [pool.submit(run, number) for number in range(len(jobs))]
+        try:
+            # Polling keeps the main thread responsive to Ctrl+C
+            while not all(future.done() for future in futures):
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            interrupted = True
+            print("Cancelling...", file=sys.stderr)
+            for token in tokens:
+                token.cancel()
+        results = [future.result() for future in futures]
+    sys.stdout = results_out
+
+    report = {
+        'jobs': results,
+        'done': sum(1 for r in results if r['status'] == 'done'),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'failed': sum(1 for r in results if r['status'] == 'error'),
+        'cancelled': sum(1 for r in results if r['status'] == 'cancelled'),
+        'failed_entries': sum(len(r.get('failed_entries') or []) for r in results),
+        'elapsed': round(time.time() - started, 3),
+    }
+    text = json.dumps(report, indent=2)
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if interrupted: return 130
+    return 1 if report['failed'] or report['failed_entries'] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Settings, per-user paths and bundled binaries. Standard library only, so the app can read its
+settings and show the window before the download engine (yt-dlp & co.) is imported.
+"""
+import os
+import sys
+import json
+
+APP_NAME = "UniversalYouTubeDownloader"
+
+# Settings shown in the Settings popup: (key, label, choices)
+SETTINGS_FIELDS = [
+    ("parallel_downloads", "Parallel playlist downloads", [1, 2, 3, 4, 6, 8]),
+    ("info_cache_disk", "Keep link info on disk", [True, False]),
+    ("stream_transcode", "Stream audio straight into ffmpeg", [False, True]),
+    ("sync_mode", "Sync playlists (new entries only)", [False, True]),
+    ("sync_prune", "Sync: delete removed entries", [False, True]),
+    ("dedupe_library", "Reuse files from other folders", [True, False]),
+    ("simultaneous_jobs", "Queue: jobs at the same time", [1, 2, 3, 4]),
+    ("metrics_export", "Export run metrics (JSONL + Prometheus)", [False, True]),
+    ("audio_format", "Audio format", ["mp3", "m4a", "opus", "original"]),
+    ("cover_max_size", "Cover art: max size (px)", [1000, 600, 1400, 3000]),
+    ("cover_from_thumbnail", "Cover art from thumbnail if none", [True, False]),
+    ("replaygain", "Album loudness tags (ReplayGain)", [False, True]),
+    ("stream_connections", "Connections per video stream", [1, 2, 4, 8, 16]),
+    ("entry_retries", "Retries per failed playlist track", [3, 0, 1, 5, 10]),
+]
+DEFAULT_SETTINGS = {key: choices[0] for key, _, choices in SETTINGS_FIELDS}
+
+
+def get_bin_path(filename):
+    """
+    Returns the path to a binary file (ffmpeg, icon).
+    Logic:
+    1. If running as compiled exe, look in ./bin/ relative to the exe.
+    2. If running as script, look in ./bin/ relative to script.
+    """
+    if getattr(sys, 'frozen', False):
+        # Running as compiled exe
+        base_path = os.path.dirname(sys.executable)
+    else:
+        # Running as python script
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    return os.path.join(base_path, "bin", filename)
+
+
+def get_app_data_dir():
+    """ Per-user folder for settings and caches (%APPDATA% on Windows, ~/.config elsewhere) """
+    base_path = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+    path = os.path.join(base_path, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_settings():
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(os.path.join(get_app_data_dir(), "settings.json"), "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        settings.update({k: v for k, v in stored.items() if k in settings})
+    except (OSError, ValueError):
+        pass
+    return settings
+
+
+def save_settings(settings):
+    try:
+        with open(os.path.join(get_app_data_dir(), "settings.json"), "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"Settings Error: {e}")
+
+
+def choice_label(value):
+    if value is True: return "On"
+    if value is False: return "Off"
+    return str(value)
@@ -1,17 +1,24 @@
+import time
+# Taken before anything else so the startup profile can attribute the import cost
+IMPORT_STARTED = time.perf_counter()
+
 import customtkinter as ctk
-import yt_dlp
+IMPORT_CTK_DONE = time.perf_counter()
 import threading
+import multiprocessing
 import os
 import sys
 import re
-import requests
-import time
-from PIL import Image
-from io import BytesIO
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, APIC
+from collections import OrderedDict
 from tkinter import filedialog, messagebox
-import ctypes
+import queue
+
+# Only the stdlib settings module is imported up front. The engine (yt-dlp, mutagen), requests and
+# PIL load on the warm-up thread once the window is on screen, see DownloaderApp.warm_up. events.py
+# (the RunEvents base class) is stdlib only as well.
+from config import SETTINGS_FIELDS, get_bin_path, get_app_data_dir, load_settings, save_settings, choice_label
+from events import RunEvents
+IMPORT_DONE = time.perf_counter()
 
 # --- Configuration & Theme ---
 ctk.set_appearance_mode("Dark")
@@ -24,22 +31,29 @@ YT_RED = "#CC0000"  # YouTube Red
 YT_RED_HOVER = "#990000"
 TEXT_WHITE = "#FFFFFF"
 
+# Thumbnail preview box (width, height) and how many decoded previews are kept around
+PREVIEW_SIZE = (250, 140)
+PREVIEW_CACHE_SIZE = 32
 
-def get_bin_path(filename):
-    """
-    Returns the path to a binary file (ffmpeg, icon).
-    Logic:
-    1. If running as compiled exe, look in ./bin/ relative to the exe.
-    2. If running as script, look in ./bin/ relative to script.
-    """
-    if getattr(sys, 'frozen', False):
-        # Running as compiled exe
-        base_path = os.path.dirname(sys.executable)
-    else:
-        # Running as python script
-        base_path = os.path.dirname(os.path.abspath(__file__))
+# Height of one row in the track editor; the editor builds only as many rows as fit the window
+TRACK_ROW_HEIGHT = 34
 
-    return os.path.join(base_path, "bin", filename)
+# Bulk actions offered by the track editor, applied to every title
+TRACK_BULK_ACTIONS = {
+    "Remove (...) and [...]": lambda title: re.sub(r"\s*[\(\[][^\)\]]*[\)\]]", "", title).strip(),
+    "Remove leading numbers": lambda title: re.sub(r"^\s*\d+\s*[\.\-\)]?\s*", "", title),
+    "Title Case": lambda title: " ".join(word[:1].upper() + word[1:] for word in title.split(" ")),
+    "Trim spaces": lambda title: " ".join(title.split()),
+}
+
+# Worker threads never touch widgets; their updates are drained on the main loop this often
+UI_FRAME_MS = 50
+
+
+def load_engine():
+    """ The engine module, imported on first use. yt-dlp's extractor registry makes this the slowest import. """
+    import engine
+    return engine
 
 
 def resource_path(relative_path):
@@ -53,11 +67,246 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+# --- HELPER CLASS: Thumbnail preview loader ---
+class ThumbnailLoader:
+    """
+    Fetches preview thumbnails over one pooled keep-alive session and decodes them
+    at reduced size. Decoded CTkImages are kept in an LRU keyed by URL, so flipping
+    back to a link shows its preview without touching the network.
+    """
+
+    def __init__(self, size=PREVIEW_SIZE, max_items=PREVIEW_CACHE_SIZE, timeout=(5, 10)):
+        self.size = size
+        self.max_items = max_items
+        self.timeout = timeout
+        self.images = OrderedDict()
+        self.lock = threading.Lock()
+
+        import requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def pick_thumbnail(self, info):
+        """ Smallest thumbnail that still covers the preview box, falling back to the largest known one. """
+        width, height = self.size
+        candidates = [t for t in info.get('thumbnails') or [] if t.get('url')]
+        sized = [t for t in candidates if t.get('width') and t.get('height')]
+
+        big_enough = [t for t in sized if t['width'] >= width and t['height'] >= height]
+        if big_enough:
+            return min(big_enough, key=lambda t: t['width'] * t['height'])['url']
+        if info.get('thumbnail'):
+            return info['thumbnail']
+        if sized:
+            return max(sized, key=lambda t: t['width'] * t['height'])['url']
+        if candidates:
+            return candidates[-1]['url']
+        return None
+
+    def pick_playlist_thumbnail(self, info):
+        """ Playlist art if present, otherwise the first entry's, without extracting that entry. """
+        thumb_url = self.pick_thumbnail(info)
+        if thumb_url:
+            return thumb_url
+
+        first = next((e for e in info.get('entries') or [] if e), None)
+        if not first:
+            return None
+        thumb_url = self.pick_thumbnail(first)
+        if not thumb_url and first.get('id') and first.get('ie_key', 'Youtube') == 'Youtube':
+            # Static 320x180 frame every YouTube video has
+            thumb_url = f"https://i.ytimg.com/vi/{first['id']}/mqdefault.jpg"
+        return thumb_url
+
+    def get_image(self, url):
+        from PIL import Image
+        from io import BytesIO
+
+        with self.lock:
+            if url in self.images:
+                self.images.move_to_end(url)
+                return self.images[url]
+
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+
+        pil_image = Image.open(BytesIO(response.content))
+        # JPEG only: let the decoder scale down by 1/2..1/8 instead of decoding full resolution
+        pil_image.draft("RGB", self.size)
+        pil_image = pil_image.convert("RGB").resize(self.size)
+        tk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=self.size)
+
+        with self.lock:
+            self.images[url] = tk_image
+            while len(self.images) > self.max_items:
+                self.images.popitem(last=False)
+        return tk_image
+
+
+# --- HELPER CLASS: Startup timing ---
+class StartupProfile:
+    """
+    Opt-in breakdown of cold start cost (--profile-startup or UYD_PROFILE_STARTUP=1).
+    Phases are marked on named tracks, "main" for the Tk thread and "warm-up" for the
+    background imports; each mark records the time since the previous mark on its track
+    and since the process started importing this module. The report goes to stderr (when
+    there is one) and to startup_profile.txt in the app data folder.
+    """
+
+    def __init__(self, enabled, started=IMPORT_STARTED):
+        self.enabled = enabled
+        self.started = started
+        self.last = {}
+        self.marks = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        enabled = "--profile-startup" in sys.argv or os.environ.get("UYD_PROFILE_STARTUP") == "1"
+        profile = cls(enabled)
+        profile.mark("import customtkinter", at=IMPORT_CTK_DONE)
+        profile.mark("import config", at=IMPORT_DONE)
+        return profile
+
+    def mark(self, phase, track="main", at=None):
+        if not self.enabled: return
+        at = time.perf_counter() if at is None else at
+        with self.lock:
+            previous = self.last.get(track, self.started)
+            self.last[track] = at
+            self.marks.append((track, phase, at - previous, at - self.started))
+
+    def report(self):
+        if not self.enabled: return
+        with self.lock:
+            lines = [f"{track:<8} {phase:<28} {took * 1000:8.1f} ms  (at {since * 1000:8.1f} ms)"
+                     for track, phase, took, since in self.marks]
+        text = "Startup profile\n" + "\n".join(lines) + "\n"
+        # --noconsole builds have no stderr
+        if sys.stderr:
+            sys.stderr.write(text)
+        try:
+            with open(os.path.join(get_app_data_dir(), "startup_profile.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            print(f"Profile Error: {e}")
+
+
+# --- HELPER CLASS: UI update bus ---
+class UIBus:
+    """
+    Thread-safe hand-off of widget updates to the Tk main loop. Workers post callbacks;
+    every UI_FRAME_MS the main loop drains the queue and runs them. Keyed updates
+    (status text, progress of one job) are coalesced so only the latest one per key
+    is rendered in a frame; unkeyed calls always run, in posting order.
+    """
+
+    def __init__(self, widget, frame_ms=UI_FRAME_MS):
+        self.widget = widget
+        self.frame_ms = frame_ms
+        self.queue = queue.SimpleQueue()
+
+    def post(self, key, callback):
+        self.queue.put((key, callback))
+
+    def call(self, callback):
+        self.queue.put((None, callback))
+
+    def start(self):
+        self.widget.after(self.frame_ms, self._drain)
+
+    def _drain(self):
+        pending = []
+        while True:
+            try:
+                pending.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        last_seen = {key: i for i, (key, _) in enumerate(pending) if key is not None}
+        for i, (key, callback) in enumerate(pending):
+            if key is not None and last_seen[key] != i: continue
+            try:
+                callback()
+            except Exception as e:
+                print(f"UI Error: {e}")
+
+        self.widget.after(self.frame_ms, self._drain)
+
+
+# --- HELPER CLASS: GUI side of a download run ---
+class AppRunEvents(RunEvents):
+    """
+    Shows a running queue job in the main window through the UI bus and asks the overwrite
+    question in a dialog. With several jobs running, status lines carry the job number.
+    """
+
+    COLORS = {"info": TEXT_WHITE, "busy": "yellow", "warning": "yellow", "done": "green", "error": "red"}
+
+    def __init__(self, app, job_id, cancel_token):
+        self.app = app
+        self.job_id = job_id
+        self.cancel_token = cancel_token
+
+    def status(self, text, level=None):
+        if len(self.app.runner.running()) > 1:
+            text = f"#{self.job_id}: {text}"
+        self.app.set_status(text, self.COLORS.get(level))
+
+    def detail(self, text):
+        self.app.set_detail(text)
+
+    def progress(self, fraction):
+        self.app.set_job_progress(self.job_id, fraction)
+
+    def estimate(self, done_bytes, total_bytes, speed, eta):
+        # Only called once the engine (and with it yt-dlp) is loaded
+        from yt_dlp.utils import format_bytes, formatSeconds
+
+        line = f"Speed: {format_bytes(speed)}/s (combined)"
+        if total_bytes:
+            line += f" | {format_bytes(done_bytes)} of ~{format_bytes(total_bytes)}"
+        if eta is not None:
+            line += f" | ETA: {formatSeconds(int(eta))}"
+        self.app.set_detail(line)
+
+    def confirm_overwrite(self, folder_name):
+        answered = threading.Event()
+        answer = []
+
+        def ask():
+            answer.append(self.app.ask_overwrite(folder_name))
+            answered.set()
+
+        # STOP cancels the run, which also ends the wait
+        handle = self.cancel_token.register(answered.set)
+        self.app.ui(ask)
+        answered.wait()
+        self.cancel_token.unregister(handle)
+        return bool(answer and answer[0])
+
+    def folder_ready(self, folder):
+        pass
+
+
 # --- HELPER CLASS: Track Editor Popup ---
 class TrackEditorDialog(ctk.CTkToplevel):
-    def __init__(self, parent, track_list, callback):
+    """
+    Virtualized tracklist editor. The titles live in a plain list (self.tracks); only the rows
+    that fit the window exist as widgets, and scrolling re-binds those rows to other indexes
+    instead of creating new ones, so a 2,000-entry playlist opens as fast as a 10-entry one.
+    Find/replace and the bulk actions work on the list, not on widgets.
+    With loading=True more titles are expected through append_tracks() (a playlist being paged
+    in); on_close is called when the dialog goes away so the producer can stop.
+    """
+
+    def __init__(self, parent, track_list, callback, loading=False, on_close=None):
         super().__init__(parent)
         self.callback = callback
+        self.loading = loading
+        self.on_close = on_close
         self.title("Edit Album Tracklist")
         self.geometry("600x700")
         self.configure(fg_color=YT_BG)
@@ -65,6 +314,7 @@ class TrackEditorDialog(ctk.CTkToplevel):
 
         self.transient(parent)
         self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
         # Set icon for popup too (From bin folder)
         try:
@@ -72,44 +322,393 @@ class TrackEditorDialog(ctk.CTkToplevel):
         except:
             pass
 
+        self.tracks = [title or "" for title in track_list]
+        self.first = 0  # index of the track shown in the top row
+        self.visible = 0  # rows that currently fit; set on the first <Configure>
+        self.rows = []  # (frame, number label, entry, bound index) per row widget
+
         # Title
-        self.lbl = ctk.CTkLabel(self, text=f"Edit {len(track_list)} Tracks", font=("Arial", 20, "bold"))
+        self.lbl = ctk.CTkLabel(self, text="", font=("Arial", 20, "bold"))
+        self.update_heading()
         self.lbl.pack(pady=10)
         self.lbl_sub = ctk.CTkLabel(self, text="These names will be used for Filenames and Tags.", text_color="gray")
         self.lbl_sub.pack(pady=0)
 
-        # Scrollable Area
-        self.scroll = ctk.CTkScrollableFrame(self, width=550, height=550, fg_color=YT_SEC)
-        self.scroll.pack(pady=10, padx=10, fill="both", expand=True)
+        # Find / replace and bulk actions
+        self.frame_tools = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame_tools.pack(pady=(10, 0), padx=10, fill="x")
+
+        self.entry_find = ctk.CTkEntry(self.frame_tools, placeholder_text="Find", width=150)
+        self.entry_find.grid(row=0, column=0, padx=(0, 5))
+        self.entry_replace = ctk.CTkEntry(self.frame_tools, placeholder_text="Replace with", width=150)
+        self.entry_replace.grid(row=0, column=1, padx=5)
+        self.chk_regex = ctk.CTkCheckBox(self.frame_tools, text="Regex", width=60)
+        self.chk_regex.grid(row=0, column=2, padx=5)
+        self.btn_replace = ctk.CTkButton(self.frame_tools, text="Replace All", width=90, command=self.replace_all,
+                                         fg_color=YT_SEC, hover_color="gray")
+        self.btn_replace.grid(row=0, column=3, padx=5)
+
+        self.opt_bulk = ctk.CTkOptionMenu(self.frame_tools, values=list(TRACK_BULK_ACTIONS), width=255,
+                                          fg_color=YT_SEC, button_color=YT_SEC)
+        self.opt_bulk.grid(row=1, column=0, columnspan=2, padx=(0, 5), pady=(5, 0), sticky="w")
+        self.btn_bulk = ctk.CTkButton(self.frame_tools, text="Apply to All", width=90, command=self.apply_bulk,
+                                      fg_color=YT_SEC, hover_color="gray")
+        self.btn_bulk.grid(row=1, column=3, padx=5, pady=(5, 0))
+
+        # Row area: a fixed pool of rows plus a scrollbar driven by self.first
+        self.frame_list = ctk.CTkFrame(self, fg_color=YT_SEC)
+        self.frame_list.pack(pady=10, padx=10, fill="both", expand=True)
+        self.frame_rows = ctk.CTkFrame(self.frame_list, fg_color="transparent")
+        self.frame_rows.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        self.scrollbar = ctk.CTkScrollbar(self.frame_list, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.frame_rows.bind("<Configure>", self.on_resize)
+        for widget in (self.frame_list, self.frame_rows):
+            widget.bind("<MouseWheel>", self.on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll_by(-3))
+            widget.bind("<Button-5>", lambda event: self.scroll_by(3))
 
-        self.entries = []
+        self.btn_save = ctk.CTkButton(self, text="SAVE CHANGES", command=self.save_and_close,
+                                      fg_color=YT_RED, hover_color=YT_RED_HOVER, height=40)
+        self.btn_save.pack(pady=10, padx=20, fill="x")
 
-        for i, title in enumerate(track_list):
-            row = ctk.CTkFrame(self.scroll, fg_color="transparent")
-            row.pack(fill="x", pady=2)
+    # --- Row pool ---
+
+    def on_resize(self, event):
+        """ Grows the row pool to fill the visible height; extra rows are hidden, never destroyed. """
+        visible = max(1, event.height // TRACK_ROW_HEIGHT)
+        while len(self.rows) < visible:
+            self.rows.append(self.make_row())
+        self.commit_rows()
+        for i, row in enumerate(self.rows):
+            if i < visible:
+                row[0].grid(row=i, column=0, sticky="ew", pady=2)
+            else:
+                row[0].grid_remove()
+        self.frame_rows.grid_columnconfigure(0, weight=1)
+        self.visible = visible
+        self.scroll_to(self.first)
+
+    def make_row(self):
+        frame = ctk.CTkFrame(self.frame_rows, fg_color="transparent", height=TRACK_ROW_HEIGHT - 4)
+        lbl_num = ctk.CTkLabel(frame, text="", width=45, text_color="gray", anchor="e")
+        lbl_num.pack(side="left", padx=5)
+        ent = ctk.CTkEntry(frame, width=450)
+        ent.pack(side="left", fill="x", expand=True)
+
+        row = [frame, lbl_num, ent, None]
+        ent.bind("<Up>", lambda event: self.move_focus(row, -1))
+        ent.bind("<Down>", lambda event: self.move_focus(row, 1))
+        for widget in (frame, lbl_num, ent):
+            widget.bind("<MouseWheel>", self.on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll_by(-3))
+            widget.bind("<Button-5>", lambda event: self.scroll_by(3))
+        return row
+
+    def commit_rows(self):
+        """ Copies what was typed into the visible rows back into the list. """
+        for _, _, ent, index in self.rows:
+            if index is not None:
+                self.tracks[index] = ent.get()
+
+    def render(self):
+        for slot, row in enumerate(self.rows[:self.visible]):
+            _, lbl_num, ent, _ = row
+            index = self.first + slot
+            if index < len(self.tracks):
+                row[3] = index
+                lbl_num.configure(text=f"{index + 1}.")
+                ent.configure(state="normal")
+                ent.delete(0, "end")
+                ent.insert(0, self.tracks[index])
+            else:
+                row[3] = None
+                lbl_num.configure(text="")
+                ent.configure(state="normal")
+                ent.delete(0, "end")
+                ent.configure(state="disabled")
+        for row in self.rows[self.visible:]:
+            row[3] = None
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total = max(len(self.tracks), 1)
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+
+    def update_heading(self):
+        suffix = " (loading...)" if self.loading else ""
+        self.lbl.configure(text=f"Edit {len(self.tracks)} Tracks{suffix}")
+
+    # --- Streaming in ---
+
+    def append_tracks(self, titles):
+        """ Adds the next page of titles; rows are only re-rendered if the new ones are on screen. """
+        if not self.winfo_exists(): return
+        shown_until = self.first + self.visible
+        on_screen = len(self.tracks) < shown_until
+        if on_screen:
+            self.commit_rows()
+        self.tracks.extend(title or "" for title in titles)
+        self.update_heading()
+        if on_screen:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def finish_loading(self):
+        if not self.winfo_exists(): return
+        self.loading = False
+        self.update_heading()
+
+    # --- Scrolling ---
+
+    def scroll_to(self, first):
+        self.commit_rows()
+        self.first = max(0, min(first, len(self.tracks) - self.visible))
+        self.render()
+
+    def scroll_by(self, rows):
+        if self.rows:
+            self.scroll_to(self.first + rows)
+        return "break"
+
+    def on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self.scroll_by(step * 3)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.tracks)))
+        elif action == "scroll":
+            self.scroll_by(int(value) * (self.visible if unit == "pages" else 1))
+
+    def move_focus(self, row, step):
+        """ Up/Down in an entry moves to the neighbouring track, scrolling at the edges. """
+        if row[3] is None: return "break"
+        target = row[3] + step
+        if not 0 <= target < len(self.tracks): return "break"
+        if not self.first <= target < self.first + self.visible:
+            self.scroll_to(self.first + step)
+        self.rows[target - self.first][2].focus_set()
+        return "break"
+
+    # --- Operations on the list ---
+
+    def replace_all(self):
+        find, replacement = self.entry_find.get(), self.entry_replace.get()
+        if not find: return
+        self.commit_rows()
+        if self.chk_regex.get():
+            try:
+                pattern = re.compile(find)
+            except re.error as e:
+                self.lbl_sub.configure(text=f"Invalid pattern: {e}", text_color="red")
+                return
+        else:
+            # Plain text: no group references in the replacement
+            pattern = re.compile(re.escape(find), re.IGNORECASE)
+            text = replacement
+            replacement = lambda match: text
+        try:
+            changed = self.update_tracks(lambda title: pattern.sub(replacement, title))
+        except re.error as e:
+            self.lbl_sub.configure(text=f"Invalid replacement: {e}", text_color="red")
+            return
+        self.lbl_sub.configure(text=f"Replaced in {changed} titles", text_color="green")
+
+    def apply_bulk(self):
+        name = self.opt_bulk.get()
+        self.commit_rows()
+        changed = self.update_tracks(TRACK_BULK_ACTIONS[name])
+        self.lbl_sub.configure(text=f"{name}: {changed} titles changed", text_color="green")
+
+    def update_tracks(self, transform):
+        """ Applies transform to every title, re-renders once, and returns how many changed. """
+        updated = [transform(title) for title in self.tracks]
+        changed = sum(1 for old, new in zip(self.tracks, updated) if old != new)
+        self.tracks = updated
+        self.render()
+        return changed
 
-            lbl_num = ctk.CTkLabel(row, text=f"{i + 1}.", width=30, text_color="gray")
-            lbl_num.pack(side="left", padx=5)
+    def save_and_close(self):
+        self.commit_rows()
+        new_list = [title.strip() for title in self.tracks]
+        self.callback(new_list)
+        self.close()
 
-            ent = ctk.CTkEntry(row, width=450)
-            ent.insert(0, title)
-            ent.pack(side="left", fill="x", expand=True)
+    def close(self):
+        if self.on_close:
+            self.on_close()
+        self.destroy()
 
-            self.entries.append(ent)
 
-        self.btn_save = ctk.CTkButton(self, text="SAVE CHANGES", command=self.save_and_close,
+# --- HELPER CLASS: Settings Popup ---
+class SettingsDialog(ctk.CTkToplevel):
+    def __init__(self, parent, settings, callback):
+        super().__init__(parent)
+        self.callback = callback
+        self.title("Settings")
+        self.geometry("420x680")
+        self.configure(fg_color=YT_BG)
+        self.resizable(False, False)
+
+        self.transient(parent)
+        self.grab_set()
+
+        try:
+            self.after(200, lambda: self.iconbitmap(get_bin_path("icon.ico")))
+        except:
+            pass
+
+        self.lbl = ctk.CTkLabel(self, text="Settings", font=("Arial", 20, "bold"))
+        self.lbl.pack(pady=10)
+
+        self.frame = ctk.CTkFrame(self, fg_color=YT_SEC)
+        self.frame.pack(pady=10, padx=10, fill="both", expand=True)
+
+        self.settings = dict(settings)
+        self.menus = {}
+        for row, (key, label, choices) in enumerate(SETTINGS_FIELDS):
+            lbl = ctk.CTkLabel(self.frame, text=label, text_color="gray")
+            lbl.grid(row=row, column=0, padx=10, pady=5, sticky="w")
+            menu = ctk.CTkOptionMenu(self.frame, values=[choice_label(c) for c in choices], width=120,
+                                     fg_color=YT_BG, button_color=YT_BG)
+            menu.set(choice_label(self.settings.get(key, choices[0])))
+            menu.grid(row=row, column=1, padx=10, pady=5, sticky="e")
+            self.menus[key] = (menu, choices)
+
+        self.btn_save = ctk.CTkButton(self, text="SAVE SETTINGS", command=self.save_and_close,
                                       fg_color=YT_RED, hover_color=YT_RED_HOVER, height=40)
         self.btn_save.pack(pady=10, padx=20, fill="x")
 
     def save_and_close(self):
-        new_list = [e.get().strip() for e in self.entries]
-        self.callback(new_list)
+        for key, (menu, choices) in self.menus.items():
+            lookup = {choice_label(c): c for c in choices}
+            self.settings[key] = lookup.get(menu.get(), choices[0])
+        self.callback(self.settings)
         self.destroy()
 
 
+# --- HELPER CLASS: Download Queue Popup ---
+class QueueDialog(ctk.CTkToplevel):
+    """
+    Live view of the job queue. Not modal, so links can keep being queued while it is open.
+    Rows are reused between refreshes and only repacked when the order changes.
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, parent, job_queue, runner):
+        super().__init__(parent)
+        self.job_queue = job_queue
+        self.runner = runner
+        self.title("Download Queue")
+        self.geometry("700x500")
+        self.configure(fg_color=YT_BG)
+        self.resizable(True, True)
+
+        self.transient(parent)
+
+        try:
+            self.after(200, lambda: self.iconbitmap(get_bin_path("icon.ico")))
+        except:
+            pass
+
+        self.lbl = ctk.CTkLabel(self, text="Download Queue", font=("Arial", 20, "bold"))
+        self.lbl.pack(pady=10)
+
+        self.scroll = ctk.CTkScrollableFrame(self, width=650, height=380, fg_color=YT_SEC)
+        self.scroll.pack(pady=5, padx=10, fill="both", expand=True)
+
+        self.btn_clear = ctk.CTkButton(self, text="CLEAR FINISHED", command=self.clear_finished,
+                                       fg_color=YT_RED, hover_color=YT_RED_HOVER, height=40)
+        self.btn_clear.pack(pady=10, padx=20, fill="x")
+
+        self.rows = {}
+        self.order = []
+        self.refresh()
+
+    def add_row(self, job_id):
+        frame = ctk.CTkFrame(self.scroll, fg_color="transparent")
+        text = ctk.CTkFrame(frame, fg_color="transparent")
+        text.pack(side="left", fill="x", expand=True, padx=5)
+        lbl_main = ctk.CTkLabel(text, text="", anchor="w")
+        lbl_main.pack(fill="x")
+        lbl_status = ctk.CTkLabel(text, text="", anchor="w", text_color="gray", font=("Arial", 11))
+        lbl_status.pack(fill="x")
+
+        buttons = {}
+        for name, label, command in (("up", "▲", lambda: self.move(job_id, 1)),
+                                     ("down", "▼", lambda: self.move(job_id, -1)),
+                                     ("retry", "↻", lambda: self.retry(job_id)),
+                                     ("remove", "✕", lambda: self.remove(job_id))):
+            buttons[name] = ctk.CTkButton(frame, text=label, width=30, command=command,
+                                          fg_color=YT_BG, hover_color="gray")
+            buttons[name].pack(side="left", padx=2)
+
+        self.rows[job_id] = {'frame': frame, 'main': lbl_main, 'status': lbl_status, 'buttons': buttons}
+        return self.rows[job_id]
+
+    def refresh(self):
+        try:
+            if not self.winfo_exists(): return
+        except Exception:
+            return
+
+        items = self.job_queue.jobs()
+        self.items = {item['id']: item for item in items}
+        for item in items:
+            row = self.rows.get(item['id']) or self.add_row(item['id'])
+            job, result = item['job'], item['result'] or {}
+            name = os.path.basename(result['folder']) if result.get('folder') else job['url']
+            row['main'].configure(text=f"#{item['id']}  {job['mode']}  {item['state']}  "
+                                       f"{int(item['progress'] * 100)}%  {name[:55]}")
+            row['status'].configure(text=(result.get('error') or item['status'] or "")[:80])
+
+            queued = item['state'] == 'queued'
+            row['buttons']['up'].configure(state="normal" if queued else "disabled")
+            row['buttons']['down'].configure(state="normal" if queued else "disabled")
+            row['buttons']['retry'].configure(state="normal" if item['state'] in self.job_queue.FINISHED else "disabled")
+
+        for job_id in set(self.rows) - set(self.items):
+            self.rows.pop(job_id)['frame'].destroy()
+
+        order = [item['id'] for item in items]
+        if order != self.order:
+            for job_id in self.order:
+                if job_id in self.rows: self.rows[job_id]['frame'].pack_forget()
+            for job_id in order:
+                self.rows[job_id]['frame'].pack(fill="x", pady=2)
+            self.order = order
+
+        self.after(self.REFRESH_MS, self.refresh)
+
+    def move(self, job_id, step):
+        item = self.items.get(job_id)
+        if item:
+            self.job_queue.set_priority(job_id, item['priority'] + step)
+
+    def retry(self, job_id):
+        self.job_queue.retry(job_id)
+        self.runner.wake()
+
+    def remove(self, job_id):
+        """ Cancels a running job, deletes any other. """
+        if job_id in self.runner.running():
+            self.runner.cancel(job_id)
+        else:
+            self.job_queue.remove(job_id)
+
+    def clear_finished(self):
+        self.job_queue.clear_finished()
+
+
 # --- MAIN APP ---
 class DownloaderApp(ctk.CTk):
     def __init__(self):
+        self.profile = StartupProfile.from_environment()
         super().__init__()
 
         self.title("Universal YouTube Downloader v0.2.0")
@@ -119,6 +718,7 @@ class DownloaderApp(ctk.CTk):
 
         # ICON SETUP
         try:
+            import ctypes
             myappid = 'kumpaan.youtubedownloader.v0.2.0'
             ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
@@ -130,16 +730,66 @@ class DownloaderApp(ctk.CTk):
             print(f"Icon Error: {e}")
 
         # Logic Flags
-        self.is_downloading = 0
-        self.cancel_download = 0
         self.target_folder = os.path.join(os.path.expanduser("~"), "Downloads")
         self.cover_art_path = ""
-        self.overwrite_permission = None
         self.custom_tracks = None
+        self.settings = load_settings()
+        self.preview_url = None
+        self.job_progress = {}
+
+        # Built by warm_up() once the window is up; wait_for_engine() before touching them
+        self.engine = None
+        self.thumbnails = None
+        self.job_queue = None
+        self.runner = None
+        self.engine_ready = threading.Event()
+        self.profile.mark("tk root")
 
         # UI Layout
         self.create_widgets()
         self.check_ffmpeg_integrity()
+        self.profile.mark("build window")
+
+        self.ui_bus = UIBus(self)
+        self.ui_bus.start()
+        self.after(0, self.first_frame)
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def first_frame(self):
+        self.update_idletasks()
+        self.profile.mark("first frame")
+
+    def warm_up(self):
+        """ Imports the engine and builds the queue off the Tk thread, so the window shows before yt-dlp loads. """
+        self.profile.mark("thread start", "warm-up")
+        try:
+            engine = load_engine()
+            self.profile.mark("import engine", "warm-up")
+            self.engine = engine.DownloadEngine.from_settings(self.settings)
+            self.thumbnails = ThumbnailLoader()
+            self.profile.mark("engine + thumbnails", "warm-up")
+
+            # Download queue: jobs persist in SQLite and run up to `simultaneous_jobs` at a time
+            self.job_queue = engine.JobQueue(os.path.join(get_app_data_dir(), "queue.sqlite"))
+            self.runner = engine.QueueRunner(self.engine, self.job_queue, self.settings.get("simultaneous_jobs", 1),
+                                             events_for=lambda job_id, job, token: AppRunEvents(self, job_id, token),
+                                             on_finish=self.finish_download)
+            self.profile.mark("open queue", "warm-up")
+        except Exception as e:
+            print(f"Startup Error: {e}")
+            self.engine = None
+            self.set_status(f"Startup Error: {e}", "red")
+            return
+        finally:
+            self.engine_ready.set()
+
+        self.ui(self.start_queue)
+        self.ui(self.profile.report)
+
+    def wait_for_engine(self):
+        """ Blocks until warm_up() is done (normally long before the first click). False if it failed. """
+        self.engine_ready.wait()
+        return self.engine is not None
 
     def create_widgets(self):
         self.lbl_title = ctk.CTkLabel(self, text="YouTube Downloader", font=("Roboto", 24, "bold"),
@@ -180,7 +830,7 @@ class DownloaderApp(ctk.CTk):
         self.lbl_std_info = ctk.CTkLabel(self.tab_std, text="Standard: Auto-creates folders for Playlists.",
                                          text_color="gray")
         self.lbl_std_info.pack(pady=5)
-        self.opt_format = ctk.CTkOptionMenu(self.tab_std, values=["Video (MP4)", "Audio Only (MP3)"],
+        self.opt_format = ctk.CTkOptionMenu(self.tab_std, values=["Video (MP4)", "Audio Only"],
                                             command=self.update_quality_options, fg_color=YT_RED, button_color=YT_RED)
         self.opt_format.pack(pady=10)
         self.opt_quality = ctk.CTkOptionMenu(self.tab_std, values=["1080p", "720p", "480p", "360p"], fg_color=YT_SEC,
@@ -223,6 +873,9 @@ class DownloaderApp(ctk.CTk):
         self.btn_browse = ctk.CTkButton(self.frame_folder, text="Browse", width=100, command=self.browse_folder,
                                         fg_color=YT_SEC, hover_color="gray")
         self.btn_browse.grid(row=0, column=1, padx=5)
+        self.btn_settings = ctk.CTkButton(self.frame_folder, text="Settings", width=80, command=self.open_settings,
+                                          fg_color=YT_SEC, hover_color="gray")
+        self.btn_settings.grid(row=0, column=2, padx=5)
 
         self.frame_actions = ctk.CTkFrame(self, fg_color="transparent")
         self.frame_actions.pack(pady=10)
@@ -238,6 +891,9 @@ class DownloaderApp(ctk.CTk):
                                              fg_color="transparent", border_width=1, border_color="gray",
                                              text_color="gray", width=100, height=40, state="disabled")
         self.btn_open_folder.grid(row=0, column=2, padx=5)
+        self.btn_queue = ctk.CTkButton(self.frame_actions, text="Queue", command=self.open_queue,
+                                       fg_color=YT_SEC, hover_color="gray", width=80, height=40)
+        self.btn_queue.grid(row=0, column=3, padx=5)
 
         self.progress_bar = ctk.CTkProgressBar(self, width=500, progress_color=YT_RED)
         self.progress_bar.set(0)
@@ -247,6 +903,29 @@ class DownloaderApp(ctk.CTk):
         self.lbl_detail_status = ctk.CTkLabel(self, text="", text_color="gray", font=("Arial", 11))
         self.lbl_detail_status.pack(pady=2)
 
+    # --- Thread-safe UI updates (callable from any thread) ---
+
+    def ui(self, callback):
+        self.ui_bus.call(callback)
+
+    def set_status(self, text, color=None):
+        if color:
+            self.ui_bus.post("status", lambda: self.lbl_status.configure(text=text, text_color=color))
+        else:
+            self.ui_bus.post("status", lambda: self.lbl_status.configure(text=text))
+
+    def set_detail(self, text):
+        self.ui_bus.post("detail", lambda: self.lbl_detail_status.configure(text=text))
+
+    def set_progress(self, fraction, job=None):
+        self.ui_bus.post(("progress", job), lambda: self.progress_bar.set(fraction))
+
+    def set_job_progress(self, job_id, fraction):
+        """ The bar shows the average over the jobs running right now. """
+        self.job_progress[job_id] = fraction
+        fractions = list(self.job_progress.values())
+        self.set_progress(sum(fractions) / len(fractions))
+
     # --- Logic ---
 
     def check_ffmpeg_integrity(self):
@@ -257,11 +936,26 @@ class DownloaderApp(ctk.CTk):
             self.lbl_detail_status.configure(text=f"Expected at: {ffmpeg_path}", text_color="red")
             self.btn_download.configure(state="disabled")
 
+    def start_queue(self):
+        """ Starts working through the queue, including jobs a previous session left unfinished. """
+        if not os.path.exists(get_bin_path("ffmpeg.exe")): return
+        self.runner.start()
+        waiting = self.job_queue.count("queued")
+        if waiting:
+            self.lbl_status.configure(text=f"Resuming {waiting} queued jobs...", text_color="yellow")
+            self.btn_stop.configure(state="normal", fg_color="red")
+
     def stop_download(self):
-        if self.is_downloading:
-            self.cancel_download = 1
-            self.lbl_status.configure(text="Stopping...", text_color="yellow")
-            self.btn_stop.configure(state="disabled")
+        """ Cancels the running jobs and holds the queue; START picks it up again. """
+        if not self.wait_for_engine(): return
+        self.runner.pause()
+        self.runner.cancel_all()
+        self.lbl_status.configure(text="Stopping... (queued jobs wait for START)", text_color="yellow")
+        self.btn_stop.configure(state="disabled", fg_color="gray")
+
+    def open_queue(self):
+        if not self.wait_for_engine(): return
+        QueueDialog(self, self.job_queue, self.runner)
 
     def update_quality_options(self, choice):
         if choice == "Video (MP4)":
@@ -278,11 +972,23 @@ class DownloaderApp(ctk.CTk):
             self.entry_folder.delete(0, "end")
             self.entry_folder.insert(0, self.target_folder)
 
+    def open_settings(self):
+        SettingsDialog(self, self.settings, self.save_app_settings)
+
+    def save_app_settings(self, settings):
+        self.settings = settings
+        save_settings(settings)
+        if self.wait_for_engine():
+            self.engine.apply_settings(settings)
+            self.runner.set_slots(settings.get("simultaneous_jobs", 1))
+        self.lbl_status.configure(text="Settings Saved", text_color="green")
+
     def select_cover_art(self):
         img_path = filedialog.askopenfilename(filetypes=[("Images", "*.jpg *.png *.jpeg")])
         if img_path:
             self.cover_art_path = img_path
             try:
+                from PIL import Image
                 pil_image = Image.open(img_path)
                 pil_image = pil_image.resize((150, 150))
                 tk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(150, 150))
@@ -312,97 +1018,116 @@ class DownloaderApp(ctk.CTk):
             self.lbl_status.configure(text="Clipboard Empty", text_color="red")
 
     def load_video_info_thread(self):
-        url = self.entry_url.get()
-        if url: threading.Thread(target=self.fetch_thumbnail, args=(url,), daemon=True).start()
+        # Several pasted links preview the first one
+        links = self.entry_url.get().split()
+        url = links[0] if links else ""
+        if url:
+            self.preview_url = url
+            threading.Thread(target=self.fetch_thumbnail, args=(url,), daemon=True).start()
 
     def fetch_thumbnail(self, url):
         try:
-            self.lbl_status.configure(text="Fetching Info...", text_color="yellow")
-
-            with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': 'in_playlist'}) as ydl:
-                info = ydl.extract_info(url, download=False)
-
-            thumb_url = None
-            title = info.get('title', 'Unknown')
-
-            if info.get('_type') == 'playlist':
-                if info.get('thumbnails'):
-                    thumb_url = info['thumbnails'][-1]['url']
-                elif info.get('thumbnail'):
-                    thumb_url = info['thumbnail']
-
-                if not thumb_url and 'entries' in info:
-                    entries = list(info['entries'])
-                    if len(entries) > 0:
-                        first = entries[0]
-                        thumb_url = first.get('thumbnail')
-                        if not thumb_url:
-                            vid_id = first.get('id')
-                            vid_url = first.get('url') or f"https://www.youtube.com/watch?v={vid_id}"
-                            try:
-                                with yt_dlp.YoutubeDL({'quiet': True}) as ydl_single:
-                                    single_info = ydl_single.extract_info(vid_url, download=False)
-                                    thumb_url = single_info.get('thumbnail')
-                            except:
-                                pass
-            else:
-                thumb_url = info.get('thumbnail')
+            if not self.wait_for_engine(): return
+            self.set_status("Fetching Info...", "yellow")
+
+            with self.engine.info_cache.stream(url) as stream:
+                info = stream.info
+                title = info.get('title', 'Unknown')
+
+                if stream.is_playlist:
+                    # The first page is enough for the artwork; later pages are only counted
+                    first_page = next(stream.pages(), [])
+                    thumb_url = self.thumbnails.pick_playlist_thumbnail({**info, 'entries': first_page[:1]})
+                else:
+                    thumb_url = self.thumbnails.pick_thumbnail(info)
+
+                tk_image = self.thumbnails.get_image(thumb_url) if thumb_url else None
 
-            if thumb_url:
-                response = requests.get(thumb_url)
-                pil_image = Image.open(BytesIO(response.content)).resize((250, 140))
-                tk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(250, 140))
-                self.lbl_thumbnail.configure(image=tk_image, text="")
+                def show_preview():
+                    # A newer link was pasted while this one loaded
+                    if url != self.preview_url: return
+                    if tk_image:
+                        self.lbl_thumbnail.configure(image=tk_image, text="")
+                    self.lbl_video_title.configure(text=title[:50])
 
-            self.lbl_video_title.configure(text=title[:50])
-            self.lbl_status.configure(text="Ready", text_color="gray")
+                self.ui(show_preview)
+                self.set_status("Ready", "gray")
+                if stream.is_playlist:
+                    self.count_preview_entries(url, stream, title, info.get('playlist_count'))
         except Exception as e:
             print(f"Thumb Error: {e}")
-            self.lbl_status.configure(text="Could not load preview", text_color="red")
+            self.set_status("Could not load preview", "red")
+
+    def count_preview_entries(self, url, stream, title, known_count=None):
+        """ Adds the entry count to the preview title, paging through the playlist if the site didn't say. """
+        def show(count, more=False):
+            if url != self.preview_url: return
+            self.lbl_video_title.configure(text=f"{title[:40]} ({count}{'+' if more else ''} videos)")
+
+        if known_count:
+            self.ui_bus.post("preview_count", lambda: show(known_count))
+            return
+
+        def on_page(count):
+            self.ui_bus.post("preview_count", lambda: show(count, more=True))
+            # Stop scanning once another link is being previewed
+            return url == self.preview_url
+
+        total = stream.count_entries(on_page)
+        if url == self.preview_url:
+            self.ui_bus.post("preview_count", lambda: show(total))
 
     def launch_track_editor(self):
-        url = self.entry_url.get()
+        links = self.entry_url.get().split()
+        url = links[0] if links else ""
         if not url:
             self.lbl_status.configure(text="Paste a URL first!", text_color="red")
             return
 
         self.btn_edit_tracks.configure(state="disabled", text="Fetching...")
-        threading.Thread(target=self.fetch_tracks_for_editor, args=(url,), daemon=True).start()
+        artist = self.entry_artist.get()
+        threading.Thread(target=self.fetch_tracks_for_editor, args=(url, artist), daemon=True).start()
 
-    def fetch_tracks_for_editor(self, url):
+    def fetch_tracks_for_editor(self, url, artist=""):
+        """ Opens the editor pre-filled with the titles as album naming would clean them. """
         try:
-            ydl_opts = {'quiet': True, 'extract_flat': True}
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-
-            if 'entries' not in info:
-                tracks = [info.get('title')]
-            else:
-                tracks = [entry.get('title') for entry in info['entries']]
-
-            self.after(0, lambda: TrackEditorDialog(self, tracks, self.save_tracklist))
+            if not self.wait_for_engine():
+                raise RuntimeError("download engine failed to load")
+            with self.engine.info_cache.stream(url) as stream:
+                titles = self.engine.titles
+                if not stream.is_playlist:
+                    tracks = titles.clean_many([stream.info.get('title')], artist)
+                    self.ui(lambda: TrackEditorDialog(self, tracks, self.save_tracklist))
+                else:
+                    # The editor opens on the first page; the rest is appended as it arrives
+                    pages = stream.pages()
+                    first = titles.clean_many([entry.get('title') for entry in next(pages, [])], artist)
+                    editor = []
+                    closed = threading.Event()
+                    self.ui(lambda: editor.append(TrackEditorDialog(self, first, self.save_tracklist,
+                                                                    loading=True, on_close=closed.set)))
+                    for page in pages:
+                        if closed.is_set(): break
+                        cleaned = titles.clean_many([entry.get('title') for entry in page], artist)
+                        self.ui(lambda cleaned=cleaned: editor[0].append_tracks(cleaned))
+                    self.ui(lambda: editor[0].finish_loading())
 
         except Exception as e:
             print(e)
-            self.lbl_status.configure(text="Error fetching tracklist", text_color="red")
+            self.set_status("Error fetching tracklist", "red")
 
-        self.btn_edit_tracks.configure(state="normal", text="Fetch & Edit Tracklist")
+        self.ui(lambda: self.btn_edit_tracks.configure(state="normal", text="Fetch & Edit Tracklist"))
 
     def save_tracklist(self, new_list):
         self.custom_tracks = new_list
         self.lbl_status.configure(text=f"Saved {len(new_list)} Custom Titles!", text_color="green")
 
     def start_thread(self):
-        if self.is_downloading == 1: return
-        self.cancel_download = 0
-        self.btn_open_folder.configure(state="disabled", text_color="gray")
-        self.overwrite_permission = None
-
-        url = self.entry_url.get()
+        """ Queues the form as one job per pasted link, and resumes the queue if STOP held it. """
+        links = self.entry_url.get().split()
         base_folder = self.entry_folder.get()
 
-        if not url: return
-        if "import " in url:
+        if "import " in self.entry_url.get():
             messagebox.showerror("Error", "Please paste a YouTube URL, not code.")
             return
 
@@ -411,228 +1136,80 @@ class DownloaderApp(ctk.CTk):
             messagebox.showerror("Error", "FFmpeg missing from /bin folder!")
             return
 
-        if not os.path.exists(base_folder):
-            try:
-                os.makedirs(base_folder)
-            except:
-                self.lbl_status.configure(text="Invalid Folder", text_color="red")
-                return
-
-        self.is_downloading = 1
-        self.btn_download.configure(state="disabled", text="Running...")
-        self.btn_stop.configure(state="normal", fg_color="red")
-
-        threading.Thread(target=self.pre_download_logic, args=(url, base_folder), daemon=True).start()
-
-    def trigger_ask_overwrite(self, folder_name):
-        response = messagebox.askyesno("Folder Exists",
-                                       f"The folder '{folder_name}' already exists.\nDo you want to write into it (merge/overwrite)?")
-        self.overwrite_permission = response
+        # Only waits when START is clicked within the first moments after launch
+        if not self.wait_for_engine(): return
 
-    def pre_download_logic(self, url, base_folder):
-        try:
-            current_tab = self.tab_view.get()
-            final_path = base_folder
-
-            self.lbl_status.configure(text="Checking Paths...", text_color="yellow")
+        if links:
+            if not os.path.exists(base_folder):
+                try:
+                    os.makedirs(base_folder)
+                except:
+                    self.lbl_status.configure(text="Invalid Folder", text_color="red")
+                    return
 
-            if current_tab == "Music Album Maker":
-                artist = self.entry_artist.get().strip()
-                album = self.entry_album.get().strip()
-                if not artist or not album:
+            jobs = [self.read_form(link, base_folder) for link in links]
+            if jobs[0].is_album:
+                if not jobs[0].artist or not jobs[0].album:
                     self.lbl_status.configure(text="Error: Artist & Album Required", text_color="red")
-                    self.finish_download(0)
                     return
-                folder_name = f"{artist} - {album}"
-                final_path = os.path.join(base_folder, folder_name)
-            else:
-                if "list=" in url:
-                    with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': 'in_playlist'}) as ydl:
-                        info = ydl.extract_info(url, download=False, process=False)
-                        if info.get('_type') == 'playlist':
-                            title = info.get('title', 'Unknown Playlist')
-                            title = "".join([c for c in title if c.isalpha() or c.isdigit() or c == ' ']).strip()
-                            final_path = os.path.join(base_folder, title)
-
-            if os.path.exists(final_path):
-                self.after(0, lambda: self.trigger_ask_overwrite(os.path.basename(final_path)))
-                while self.overwrite_permission is None:
-                    if self.cancel_download: return
-                    time.sleep(0.1)
-
-                if self.overwrite_permission is False:
-                    self.lbl_status.configure(text="Download Cancelled", text_color="yellow")
-                    self.finish_download(0)
+                if len(jobs) > 1:
+                    self.lbl_status.configure(text="Album Maker takes one playlist link", text_color="red")
                     return
+                # The edited tracklist travels with this job
+                self.custom_tracks = None
 
-            self.final_download_path = final_path
-            self.run_download(url, final_path)
-
-        except Exception as e:
-            print(f"Pre-download error: {e}")
-            self.lbl_status.configure(text="Error fetching info", text_color="red")
-            self.finish_download(0)
-
-    def clean_title_logic(self, raw_title, artist_name, index=None):
-        if self.custom_tracks and index is not None:
-            if 0 <= index < len(self.custom_tracks):
-                return self.custom_tracks[index]
-
-        track_prefix = ""
-        match = re.match(r'^(\d{2}-)', raw_title)
-        if match:
-            track_prefix = match.group(1)
-            raw_title = raw_title[len(track_prefix):]
-
-        clean = raw_title
-        if artist_name and clean.lower().startswith(artist_name.lower()):
-            clean = clean[len(artist_name):]
-            clean = re.sub(r'^[\s\-\:]+', '', clean)
-        clean = re.sub(r'\s*[\(\[].*?(official|video|lyrics|4k|hd|hq|visualizer).*?[\)\]]', '', clean,
-                       flags=re.IGNORECASE)
-
-        return track_prefix + clean.strip()
-
-    def run_download(self, url, folder_path):
-        try:
-            self.lbl_status.configure(text="Starting Download...", text_color=TEXT_WHITE)
-            current_tab = self.tab_view.get()
-
-            # UPDATED: Use get_bin_path for ffmpeg
-            ffmpeg_dir = os.path.dirname(get_bin_path("ffmpeg.exe"))
-
-            ydl_opts = {
-                'outtmpl': f'{folder_path}/%(title)s.%(ext)s',
-                'progress_hooks': [self.progress_hook],
-                'ignoreerrors': True,
-                'ffmpeg_location': ffmpeg_dir,  # Point to ./bin/ folder
-            }
-
-            if current_tab == "Standard Download":
-                fmt = self.opt_format.get()
-                quality = self.opt_quality.get()
-                if "list=" in url:
-                    ydl_opts['outtmpl'] = f'{folder_path}/%(title)s.%(ext)s'
-
-                if fmt == "Audio Only (MP3)":
-                    kbps = quality.replace("kbps", "")
-                    ydl_opts['format'] = 'bestaudio/best'
-                    ydl_opts['postprocessors'] = [
-                        {'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': kbps}]
-                else:
-                    height = quality.replace("p", "")
-                    ydl_opts['format'] = f'bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-
-            elif current_tab == "Music Album Maker":
-                kbps = self.opt_album_quality.get().replace("kbps", "")
-                ydl_opts['outtmpl'] = f'{folder_path}/%(playlist_index)s-%(title)s.%(ext)s'
-                ydl_opts['format'] = 'bestaudio/best'
-                ydl_opts['postprocessors'] = [
-                    {'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': kbps}]
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-
-            self.finish_download(1)
-
-        except Exception as e:
-            if "User Cancelled" in str(e):
-                self.lbl_status.configure(text="Cancelled", text_color="yellow")
-            else:
-                self.lbl_status.configure(text=f"Error: Check Console", text_color="red")
-                print(e)
-            self.finish_download(0)
-
-    def progress_hook(self, d):
-        if self.cancel_download == 1: raise Exception("User Cancelled")
-
-        if d['status'] == 'downloading':
-            try:
-                p = d.get('_percent_str', '0%').replace('%', '')
-                self.progress_bar.set(float(p) / 100)
-                title = d.get('info_dict', {}).get('title', 'Unknown')
-                self.lbl_status.configure(text=f"Downloading: {title[:30]}...")
-                self.lbl_detail_status.configure(text=f"Speed: {d.get('_speed_str')} | ETA: {d.get('_eta_str')}")
-            except:
-                pass
-        elif d['status'] == 'finished':
-            self.lbl_status.configure(text="Processing...", text_color="yellow")
-
-    def finish_download(self, success):
-        self.is_downloading = 0
-        self.btn_download.configure(state="normal", text="START DOWNLOAD")
-        self.btn_stop.configure(state="disabled", fg_color="gray")
-        self.progress_bar.set(0)
-
-        if success == 1:
-            self.lbl_status.configure(text="Complete!", text_color="green")
-            self.lbl_detail_status.configure(text="Files saved successfully.")
-            self.btn_open_folder.configure(state="normal", text_color=TEXT_WHITE, border_color=YT_RED)
-
-            if self.tab_view.get() == "Music Album Maker":
-                self.batch_tag_files()
-
-    def batch_tag_files(self):
-        artist = self.entry_artist.get()
-        album = self.entry_album.get()
-        year = self.entry_year.get()
-        folder = self.final_download_path
-
-        self.lbl_status.configure(text="Tagging & Renaming...", text_color="yellow")
+            job_ids = [self.job_queue.add(job) for job in jobs]
+            self.entry_url.delete(0, "end")
+            waiting = self.job_queue.count("queued")
+            label = f"#{job_ids[0]}" if len(job_ids) == 1 else f"#{job_ids[0]}-#{job_ids[-1]}"
+            self.lbl_status.configure(text=f"Queued {label} ({waiting} waiting)", text_color="yellow")
+        elif not self.job_queue.count("queued"):
+            return
 
-        for filename in os.listdir(folder):
-            if filename.endswith(".mp3"):
-                try:
-                    filepath = os.path.join(folder, filename)
-
-                    file_index = None
-                    track_prefix = ""
-                    match_track = re.match(r'^(\d+)-', filename)
-                    if match_track:
-                        track_prefix = match_track.group(1)
-                        file_index = int(track_prefix) - 1
-
-                    clean_name = self.clean_title_logic(os.path.splitext(filename)[0], artist, index=file_index)
-
-                    if re.match(r'^\d-', clean_name):
-                        pass
-                    else:
-                        if track_prefix:
-                            clean_name = f"{track_prefix}-{clean_name}"
-
-                    try:
-                        audio = EasyID3(filepath)
-                    except:
-                        audio = EasyID3()
-                        audio.save(filepath)
-                        audio = EasyID3(filepath)
-
-                    if artist: audio['artist'] = artist
-                    if album: audio['album'] = album
-                    if year: audio['date'] = year
-                    if track_prefix: audio['tracknumber'] = track_prefix
-
-                    title_only = re.sub(r'^\d+-', '', clean_name)
-                    audio['title'] = title_only
-                    audio.save()
-
-                    if self.cover_art_path and os.path.exists(self.cover_art_path):
-                        audio_id3 = ID3(filepath)
-                        with open(self.cover_art_path, 'rb') as albumart:
-                            audio_id3.add(
-                                APIC(encoding=3, mime='image/jpeg', type=3, desc=u'Cover', data=albumart.read()))
-                        audio_id3.save()
-
-                    new_path = os.path.join(folder, f"{clean_name}.mp3")
-                    if not os.path.exists(new_path):
-                        os.rename(filepath, new_path)
-                except Exception as e:
-                    print(f"Tag Error: {e}")
+        self.runner.resume()
+        self.btn_stop.configure(state="normal", fg_color="red")
 
-        self.custom_tracks = None
-        self.lbl_status.configure(text="Album Complete!", text_color="green")
+    def read_form(self, url, base_folder):
+        """ Snapshot of the form as a DownloadJob, taken on the main thread so workers never read widgets. """
+        if self.tab_view.get() == "Music Album Maker":
+            mode, quality = "album", self.opt_album_quality.get()
+        elif self.opt_format.get() == "Audio Only":
+            mode, quality = "audio", self.opt_quality.get()
+        else:
+            mode, quality = "video", self.opt_quality.get()
+        return load_engine().DownloadJob(url, base_folder, mode, quality,
+                                         artist=self.entry_artist.get(),
+                                         album=self.entry_album.get(),
+                                         year=self.entry_year.get(),
+                                         cover_art_path=self.cover_art_path,
+                                         custom_tracks=self.custom_tracks)
+
+    def ask_overwrite(self, folder_name):
+        return messagebox.askyesno("Folder Exists",
+                                   f"The folder '{folder_name}' already exists.\nDo you want to write into it (merge/overwrite)?")
+
+    def finish_download(self, job_id, job, result):
+        """ Queue runner callback, on the finished job's thread. """
+        success = result['status'] == 'done'
+        self.job_progress.pop(job_id, None)
+        if success and result['folder']:
+            self.final_download_path = result['folder']
+
+        idle = not self.runner.busy()
+        if idle:
+            self.set_progress(0)
+
+        def update_buttons():
+            if success:
+                self.btn_open_folder.configure(state="normal", text_color=TEXT_WHITE, border_color=YT_RED)
+            if idle:
+                self.btn_stop.configure(state="disabled", fg_color="gray")
+
+        self.ui(update_buttons)
 
 
 if __name__ == "__main__":
+    # The exe is re-launched as the loudness analysis workers; those must not open a window
+    multiprocessing.freeze_support()
     app = DownloaderApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
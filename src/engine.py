@@ -0,0 +1,2859 @@
+"""
+Download engine: everything that turns a link into tagged files on disk, without a GUI.
+downloader.py (the desktop app) and cli.py (batch mode) both drive it through DownloadEngine.
+"""
+import yt_dlp
+import threading
+import os
+import re
+import requests
+import time
+import json
+import glob
+import shutil
+import sqlite3
+import copy
+import hashlib
+import itertools
+import base64
+import sys
+import random
+import heapq
+import http.client
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, parse_qs
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+import mutagen
+from mutagen.id3 import ID3, APIC, TPE1, TALB, TDRC, TRCK, TIT2, TXXX
+from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+from mutagen.flac import Picture
+import queue
+import subprocess
+
+from config import DEFAULT_SETTINGS, get_bin_path, get_app_data_dir
+from events import RunEvents
+
+
+# Link info is reused for this long (format URLs handed out by YouTube expire after a few hours)
+INFO_CACHE_SIZE = 32
+INFO_CACHE_TTL = 60 * 60
+
+# Playlist entries fetched per page by PlaylistStream (the preview and tracklist show the first page)
+PLAYLIST_PAGE_SIZE = 100
+# A stream that reaches the end of a playlist up to this long is cached whole, so the download
+# reuses the enumeration the preview or tracklist editor already did; longer ones are not kept
+PLAYLIST_CACHE_ENTRIES = 5000
+
+# Title cleanup rules; any of them can be overridden in title_rules.json in the app data folder
+DEFAULT_TITLE_RULES = {
+    # A (...), [...] or {...} group containing one of these words is dropped
+    "noise_keywords": ["official", "video", "lyrics", "lyric", "4k", "hd", "hq", "visualizer", "audio", "mv"],
+    # Characters that may separate the artist from the song ("Artist - Song", "Artist | Song")
+    "separators": ["-", "\u2013", "\u2014", ":", "|", "~"],
+    # "keep", "normalize" (rewrite ft./featuring as "(feat. X)") or "remove"
+    "feat": "keep",
+    # "remove" drops "(Remastered 2011)" and " - 2011 Remaster"; "keep" leaves them
+    "remaster": "remove",
+    # Keep a leading "01-" (album naming replaces it with the playlist position anyway)
+    "keep_track_prefix": True,
+    # Extra [regex, replacement] pairs, case-insensitive, applied after everything else
+    "patterns": [],
+}
+
+# Audio containers the app writes: extension, ffmpeg muxer, source codecs it holds as-is, encoder otherwise
+AUDIO_FORMATS = {
+    "mp3": {"ext": "mp3", "muxer": "mp3", "copy": ("mp3",), "encoder": "libmp3lame"},
+    "m4a": {"ext": "m4a", "muxer": "ipod", "copy": ("mp4a", "aac", "alac"), "encoder": "aac"},
+    "opus": {"ext": "opus", "muxer": "opus", "copy": ("opus",), "encoder": "libopus"},
+    "ogg": {"ext": "ogg", "muxer": "ogg", "copy": ("vorbis",), "encoder": "libvorbis"},
+}
+
+# Embedded cover art: longest side in pixels and JPEG quality of the one buffer shared by every track
+COVER_MAX_SIZE = 1000
+COVER_JPEG_QUALITY = 90
+
+# Files tagged at once by the album tagger (tagging is disk-bound, threads are enough)
+TAG_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# ffmpeg encoders run next to the downloads, one per core
+TRANSCODE_WORKERS = os.cpu_count() or 2
+
+# Playlist entries resolved ahead of their download (for the job's expected size): threads, how many
+# entries at most are resolved or waiting to be taken, and how long a resolved entry stays usable
+# for the download itself (stream URLs expire after a few hours)
+PREFETCH_WORKERS = 2
+PREFETCH_AHEAD = 8
+PREFETCH_TTL = 3600
+
+# Playlist entries that failed for a passing reason are queued again, after a jittered exponential
+# backoff (seconds) unless the server named a Retry-After
+ENTRY_RETRY_BASE = 2.0
+ENTRY_RETRY_MAX = 120.0
+
+# Gap between request starts to a host that throttled us: at least the min after a throttle, doubled
+# per further throttle up to the max, and shrunk by THROTTLE_RECOVERY per success (to none below min/8)
+THROTTLE_MIN_INTERVAL = 0.25
+THROTTLE_MAX_INTERVAL = 30.0
+THROTTLE_RECOVERY = 0.9
+
+# Error texts of rate limiting that does not come with a 429 (YouTube's bot check, for one)
+THROTTLE_PATTERN = re.compile(r"\b429\b|too many requests|rate.?limit|confirm you.?re not a bot|try again later",
+                              re.IGNORECASE)
+
+# Loudness analysis processes (decode plus NumPy filtering is CPU-bound, so processes, not threads)
+LOUDNESS_WORKERS = os.cpu_count() or 2
+
+# Keep ffmpeg from flashing a console window in the --noconsole build
+SUBPROCESS_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+def entry_url(entry):
+    """ Watch URL for a flat playlist entry. """
+    return entry.get('url') or entry.get('webpage_url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
+
+
+def playlist_jobs(info):
+    """
+    Splits an expanded playlist into [(playlist_index, entry)] plus the playlist fields
+    yt-dlp would add to each entry (used when entries are processed one by one).
+    """
+    entries = info.get('entries') or []
+    indices = info.get('requested_entries') or range(1, len(entries) + 1)
+    jobs = [(index, entry) for index, entry in zip(indices, entries) if entry]
+    playlist_info = {
+        'playlist': info.get('title') or info.get('id'),
+        'playlist_id': info.get('id'),
+        'playlist_title': info.get('title'),
+        'playlist_count': info.get('playlist_count') or len(entries),
+        'n_entries': len(entries),
+        '__last_playlist_index': max((index for index, _ in jobs), default=0),
+    }
+    return jobs, playlist_info
+
+
+def classify_failure(error):
+    """
+    Sorts a failed entry into 'throttled' (the host is rate limiting), 'transient' (network trouble,
+    server errors, expired stream URLs: worth another try) or 'permanent' (private, removed, bad
+    format, a failed postprocessor). Returns (kind, retry_after) with the server's Retry-After in
+    seconds when it sent one. Follows the chain yt-dlp wraps errors in down to the cause.
+    """
+    kind, throttled = None, False
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status, headers = None, {}
+        if isinstance(error, HTTPError):
+            status, headers = error.status, error.response.headers
+        elif isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            status, headers = error.response.status_code, error.response.headers
+        if status in (429, 503):
+            try:
+                retry_after = float(headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                retry_after = None
+            return 'throttled', retry_after
+        # Keep looking for the response itself (and its Retry-After)
+        throttled = throttled or bool(THROTTLE_PATTERN.search(str(error)))
+        if isinstance(error, yt_dlp.utils.PostProcessingError):
+            return 'permanent', None
+        # The deepest error that says anything decides
+        if status is not None:
+            # 403 on a stream is usually an expired URL; the retry extracts a fresh one
+            kind = 'transient' if status >= 500 or status in (403, 408) else 'permanent'
+        elif isinstance(error, (TransportError, requests.exceptions.RequestException, OSError,
+                                http.client.IncompleteRead)):
+            kind = 'transient'
+        elif isinstance(error, yt_dlp.utils.ExtractorError) and error.expected:
+            kind = 'permanent'
+
+        exc_info = getattr(error, 'exc_info', None)
+        error = getattr(error, 'cause', None) or (exc_info[1] if exc_info else None) \
+            or error.__cause__ or error.__context__
+    return ('throttled' if throttled else kind or 'transient'), None
+
+
+def remove_partial_files(folder, since, stems=None):
+    """
+    Deletes download/encode leftovers (.part, fragments, .ytdl, pre-merge streams) created since `since`.
+    With `stems` (output paths without extension), only leftovers of those outputs are touched,
+    so a cancelled job doesn't take the partial files of another job in the same folder with it.
+    """
+    patterns = ("*.part", "*.part.ranges", "*.part-Frag*", "*.ytdl", "*.temp.*", "*.f[0-9]*.*")
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(glob.escape(folder), pattern)):
+            if stems is not None and not any(path.startswith(stem + ".") for stem in stems): continue
+            try:
+                if os.path.getmtime(path) >= since:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def clean_title_logic(raw_title, artist_name, custom_tracks=None, index=None):
+    """ Edited title for this index if there is one, else raw_title cleaned with the default rules. """
+    if custom_tracks and index is not None:
+        if 0 <= index < len(custom_tracks):
+            return custom_tracks[index]
+    return DEFAULT_TITLE_NORMALIZER.clean(raw_title, artist_name)
+
+
+def open_metrics_exporter(settings):
+    if not settings.get("metrics_export"): return None
+    return MetricsExporter(os.path.join(get_app_data_dir(), "metrics.jsonl"),
+                           os.path.join(get_app_data_dir(), "metrics.prom"))
+
+
+def title_rules_path():
+    return os.path.join(get_app_data_dir(), "title_rules.json")
+
+
+def info_cache_dir(settings):
+    if not settings.get("info_cache_disk"): return None
+    return os.path.join(get_app_data_dir(), "info_cache")
+
+
+def open_media_index(settings):
+    if not settings.get("dedupe_library"): return None
+    try:
+        return MediaIndex(os.path.join(get_app_data_dir(), "media_index.sqlite"))
+    except sqlite3.Error as e:
+        print(f"Index Error: {e}")
+        return None
+
+
+# --- HELPER CLASS: Cancellation ---
+class UserCancelled(yt_dlp.utils.DownloadCancelled):
+    """ Raised when STOP is pressed. yt-dlp re-raises DownloadCancelled even with ignoreerrors on. """
+    msg = "User Cancelled"
+
+
+class CancelToken:
+    """
+    Cancellation shared by everything one download run starts. cancel() sets the event and
+    immediately runs the registered teardown callbacks (killing ffmpeg, closing HTTP
+    streams), so in-flight work stops without waiting for the next progress hook.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = {}
+        self.next_handle = 0
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        with self.lock:
+            self.event.set()
+            callbacks = list(self.callbacks.values())
+            self.callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel Error: {e}")
+
+    def check(self):
+        if self.event.is_set(): raise UserCancelled()
+
+    def register(self, callback):
+        """ Runs callback on cancel (right away if already cancelled). Returns a handle for unregister. """
+        with self.lock:
+            if not self.event.is_set():
+                self.next_handle += 1
+                self.callbacks[self.next_handle] = callback
+                return self.next_handle
+        callback()
+        return None
+
+    def unregister(self, handle):
+        with self.lock:
+            self.callbacks.pop(handle, None)
+
+
+# --- HELPER CLASS: Shared link info cache ---
+class InfoCache:
+    """
+    Flat extract_info results shared by the preview, tracklist, path check and download stages,
+    so one pasted link is only extracted once.
+    Results are held in memory (LRU) and optionally mirrored to disk; both expire after `ttl` seconds.
+    """
+
+    YDL_OPTS = {'quiet': True, 'extract_flat': 'in_playlist'}
+
+    def __init__(self, max_items=INFO_CACHE_SIZE, ttl=INFO_CACHE_TTL, disk_dir=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.items = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(url):
+        """ Normalizes a link to 'playlist:<id>' / 'video:<id>' so equivalent URLs share an entry. """
+        url = url.strip()
+        parsed = urlparse(url if "://" in url else f"https://{url}")
+        query = parse_qs(parsed.query)
+        host = parsed.netloc.lower()
+
+        if query.get("list"):
+            return f"playlist:{query['list'][0]}"
+        if query.get("v"):
+            return f"video:{query['v'][0]}"
+        if host.endswith("youtu.be") and parsed.path.strip("/"):
+            return f"video:{parsed.path.strip('/').split('/')[0]}"
+        match = re.match(r'^/(shorts|live|embed)/([\w-]+)', parsed.path)
+        if match:
+            return f"video:{match.group(2)}"
+        return url
+
+    def get(self, url):
+        key = self.cache_key(url)
+        with self.lock:
+            item = self.items.get(key)
+            if item and time.time() - item[0] < self.ttl:
+                self.items.move_to_end(key)
+                return copy.deepcopy(item[1])
+
+        info = self._read_disk(key)
+        if info is not None:
+            self._store(key, info, write_disk=False)
+        return info
+
+    def get_or_extract(self, url):
+        """ Returns a private copy of the info dict, extracting it at most once across threads. """
+        info = self.get(url)
+        if info is not None:
+            return info
+
+        key = self.cache_key(url)
+        with self.lock:
+            waiter = self.pending.get(key)
+            owner = waiter is None
+            if owner:
+                waiter = self.pending[key] = threading.Event()
+
+        if not owner:
+            waiter.wait()
+            info = self.get(url)
+            if info is not None:
+                return info
+
+        try:
+            with yt_dlp.YoutubeDL(self.YDL_OPTS) as ydl:
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            self._store(key, info)
+            return copy.deepcopy(info)
+        finally:
+            if owner:
+                with self.lock:
+                    self.pending.pop(key, None)
+                waiter.set()
+
+    def stream(self, url, page_size=PLAYLIST_PAGE_SIZE):
+        """
+        Opens `url` as a PlaylistStream. A cached extraction is paged from memory; otherwise the
+        playlist is enumerated lazily. Single videos (fully extracted anyway) are cached right away,
+        playlists once the stream has paged through all of their entries.
+        """
+        info = self.get(url)
+        if info is not None:
+            return PlaylistStream.from_info(url, info, page_size)
+
+        key = self.cache_key(url)
+        stream = PlaylistStream(url, page_size,
+                                on_complete=lambda info: self._store(key, copy.deepcopy(info))).open()
+        if not stream.is_playlist:
+            self._store(key, copy.deepcopy(stream.info))
+        return stream
+
+    def _store(self, key, info, write_disk=True):
+        with self.lock:
+            self.items[key] = (time.time(), info)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        if write_disk and self.disk_dir:
+            try:
+                with open(self._disk_path(key), "w", encoding="utf-8") as f:
+                    json.dump({"key": key, "time": time.time(), "info": info}, f)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Cache Error: {e}")
+
+    def _read_disk(self, key):
+        if not self.disk_dir: return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("key") != key or time.time() - record.get("time", 0) >= self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["info"]
+
+    def _disk_path(self, key):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+# --- HELPER CLASS: Lazy playlist enumeration ---
+class PlaylistStream:
+    """
+    Pages through a link's playlist entries without expanding the whole playlist first.
+    The link is resolved with process=False, so yt-dlp hands back the extractor's lazy entry
+    iterator and only fetches continuation pages as they are consumed. Pages are not kept,
+    so counting or scanning a channel with thousands of videos stays in bounded memory.
+    `info` is the playlist without its entries, or the fully extracted video for single links.
+    With `on_complete`, the entries of a playlist of up to PLAYLIST_CACHE_ENTRIES are collected
+    as they are paged, and the expanded playlist is handed to it once the last page is read.
+    """
+
+    YDL_OPTS = {'quiet': True, 'extract_flat': 'in_playlist', 'lazy_playlist': True}
+
+    def __init__(self, url, page_size=PLAYLIST_PAGE_SIZE, on_complete=None):
+        self.url = url
+        self.page_size = page_size
+        self.info = None
+        self.is_playlist = False
+        self.count = 0  # entries yielded so far
+        self.ydl = None
+        self.entries = None
+        self.iterator = None
+        self.on_complete = on_complete
+        self.collected = [] if on_complete else None
+
+    @classmethod
+    def from_info(cls, url, info, page_size=PLAYLIST_PAGE_SIZE):
+        """ Stream over an info dict that is already expanded (e.g. from InfoCache). """
+        stream = cls(url, page_size)
+        stream.is_playlist = info.get('_type') == 'playlist'
+        stream.entries = info.pop('entries', None) if stream.is_playlist else None
+        stream.info = info
+        return stream
+
+    def open(self):
+        self.ydl = yt_dlp.YoutubeDL(self.YDL_OPTS)
+        try:
+            result = self.ydl.extract_info(self.url, download=False, process=False)
+            # Watch links with &list= come back as a pointer to the playlist's own extractor
+            for _ in range(3):
+                if result.get('_type') not in ('url', 'url_transparent'): break
+                result = self.ydl.extract_info(result['url'], download=False, process=False,
+                                               ie_key=result.get('ie_key'))
+
+            if result.get('_type') in ('playlist', 'multi_video'):
+                self.is_playlist = True
+                self.entries = result.pop('entries', None) or []
+                self.info = self.ydl.sanitize_info({**result, '_type': 'playlist'})
+            else:
+                self.info = self.ydl.sanitize_info(self.ydl.process_ie_result(result, download=False))
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def pages(self):
+        """ Yields lists of up to page_size flat entries, fetching each page only when it is asked for. """
+        if not self.is_playlist: return
+        # One iterator for the stream's lifetime: a later pages() call picks up where the last one stopped
+        if self.iterator is None:
+            self.iterator = self._iter_entries()
+        while True:
+            chunk = list(itertools.islice(self.iterator, self.page_size))
+            if not chunk:
+                if self.collected is not None:
+                    self.on_complete({**self.info, 'entries': self.collected})
+                    self.collected = None
+                return
+            page = [self.ydl.sanitize_info(e) if self.ydl else e for e in chunk if e]
+            self.count += len(page)
+            if self.collected is not None and self.count <= PLAYLIST_CACHE_ENTRIES:
+                self.collected.extend(page)
+            else:
+                # Too long to keep around: give up on caching and stay in bounded memory
+                self.collected = None
+            if page:
+                yield page
+
+    def count_entries(self, on_page=None):
+        """ Walks the remaining pages without keeping them; returns the total seen. """
+        for _ in self.pages():
+            if on_page and on_page(self.count) is False: break
+        return self.count
+
+    def _iter_entries(self):
+        entries = self.entries
+        if isinstance(entries, yt_dlp.utils.PagedList):
+            for start in itertools.count(0, self.page_size):
+                chunk = entries.getslice(start, start + self.page_size)
+                yield from chunk
+                if len(chunk) < self.page_size: return
+        else:
+            yield from entries or []
+
+    def close(self):
+        if self.ydl:
+            self.ydl.close()
+            self.ydl = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- HELPER CLASS: Title normalization ---
+class TitleNormalizer:
+    """
+    Turns raw video titles into track names: strips the artist prefix, noise groups such as
+    "(Official Video)", remaster tags and configured patterns, and optionally rewrites "feat.".
+    Every regex is compiled once per rule set (the artist prefix once per artist), so cleaning
+    a whole tracklist with clean_many() costs a few regex passes per title.
+    """
+
+    TRACK_PREFIX = re.compile(r'^(\d{2}-)')
+    GROUP = re.compile(r'\s*[\(\[\{]([^\(\)\[\]\{\}]*)[\)\]\}]')
+    REMASTER = re.compile(r'\bremaster(?:ed)?\b', re.IGNORECASE)
+
+    def __init__(self, rules=None):
+        rules = {**DEFAULT_TITLE_RULES, **(rules or {})}
+        if rules["feat"] not in ("keep", "normalize", "remove"):
+            raise ValueError(f"feat must be keep, normalize or remove, not {rules['feat']!r}")
+        self.rules = rules
+
+        keywords = "|".join(re.escape(k) for k in rules["noise_keywords"])
+        self.noise = re.compile(rf'\b(?:{keywords})\b', re.IGNORECASE) if keywords else None
+        self.remove_remaster = rules["remaster"] == "remove"
+
+        self.sep_class = "[\\s" + "".join(re.escape(c) for c in rules["separators"]) + "]"
+        self.edges = re.compile(rf'^{self.sep_class}+|{self.sep_class}+$')
+        # The featured artists end at a group, the end of the title or a spaced separator
+        # ("Song ft. Bob - Remix", "Song ft. Bob / Live"); "Jay-Z" or "AC/DC" stay whole
+        feat_end = "\\s+[" + "".join(re.escape(c) for c in rules["separators"]) + "/]\\s"
+        self.feat = re.compile(
+            rf'\s*[\(\[]?\b(?:feat\.?|ft\.|featuring)\s+([^\(\)\[\]]+?)[\)\]]?(?=\s*(?:[\(\[]|$)|{feat_end})',
+            re.IGNORECASE)
+        self.remaster_suffix = re.compile(
+            rf'\s*{self.sep_class}\s*(?:\d{{4}}\s+)?(?:digital(?:ly)?\s+)?remaster(?:ed)?\b[^\(\)\[\]]*$',
+            re.IGNORECASE)
+        self.patterns = [(re.compile(pattern, re.IGNORECASE), replacement)
+                         for pattern, replacement in rules["patterns"]]
+        self.artists = {}
+
+    @classmethod
+    def from_file(cls, path):
+        """ Rules from a JSON file merged over the defaults; the defaults alone if it is missing or invalid. """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, TypeError, KeyError, re.error) as e:
+            print(f"Title Rules Error: {e}")
+            return cls()
+
+    def artist_prefix(self, artist_name):
+        if not artist_name: return None
+        pattern = self.artists.get(artist_name)
+        if pattern is None:
+            pattern = re.compile(rf'^{re.escape(artist_name)}{self.sep_class}+', re.IGNORECASE)
+            if len(self.artists) > 256:
+                self.artists.clear()
+            self.artists[artist_name] = pattern
+        return pattern
+
+    def clean(self, raw_title, artist_name=""):
+        return self._clean(raw_title, self.artist_prefix(artist_name))
+
+    def clean_many(self, titles, artist_name=""):
+        """ Cleans a whole tracklist with one artist; None titles come back as "". """
+        artist = self.artist_prefix(artist_name)
+        return [self._clean(title or "", artist) for title in titles]
+
+    def _clean(self, title, artist):
+        track_prefix = ""
+        match = self.TRACK_PREFIX.match(title)
+        if match:
+            track_prefix = match.group(1) if self.rules["keep_track_prefix"] else ""
+            title = title[match.end():]
+
+        if artist:
+            title = artist.sub("", title, count=1)
+        # Cheap substring checks skip the regex passes that cannot match
+        if "(" in title or "[" in title or "{" in title:
+            title = self.GROUP.sub(self._drop_group, title)
+        if self.remove_remaster and "remaster" in title.lower():
+            title = self.remaster_suffix.sub("", title)
+        if self.rules["feat"] == "remove":
+            title = self.feat.sub("", title)
+        elif self.rules["feat"] == "normalize":
+            title = self.feat.sub(lambda m: f" (feat. {m.group(1).strip()})", title)
+        for pattern, replacement in self.patterns:
+            title = pattern.sub(replacement, title)
+
+        title = self.edges.sub("", " ".join(title.split()))
+        return track_prefix + title
+
+    def _drop_group(self, match):
+        inner = match.group(1)
+        if self.noise and self.noise.search(inner): return ""
+        if self.remove_remaster and self.REMASTER.search(inner): return ""
+        return match.group(0)
+
+
+DEFAULT_TITLE_NORMALIZER = TitleNormalizer()
+
+
+# --- HELPER CLASS: Per-run metrics ---
+class RunMetrics:
+    """
+    Busy time per pipeline stage for one job, in total and per track (keyed by video ID),
+    plus downloaded bytes and counters for retries and failures. Stage times are summed
+    across worker threads, so with parallel downloads they can exceed the wall time;
+    compare stages with each other to see whether a run is network-, CPU- or disk-bound.
+    """
+
+    STAGES = ("extract", "download", "transcode", "tag", "rename", "loudness")
+
+    def __init__(self):
+        self.stages = dict.fromkeys(self.STAGES, 0.0)
+        self.bytes = 0
+        self.counters = {"retries": 0, "warnings": 0, "errors": 0}
+        self.failures = {}  # stage -> count
+        self.tracks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def track(self, info):
+        """ Per-track record for an info dict (created on first use); None for entries without an ID. """
+        video_id = info.get('id') if info else None
+        if not video_id: return None
+        record = self.tracks.get(video_id)
+        if record is None:
+            record = self.tracks[video_id] = {'id': video_id, 'title': info.get('title'),
+                                              'index': info.get('playlist_index'), 'bytes': 0,
+                                              **dict.fromkeys(self.STAGES, 0.0)}
+        return record
+
+    def add(self, stage, seconds, info=None):
+        with self.lock:
+            self.stages[stage] += seconds
+            record = self.track(info)
+            if record: record[stage] += seconds
+
+    @contextmanager
+    def stage(self, name, info=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, info)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def fail(self, stage, info=None):
+        """ A failure that would otherwise only be printed (ignoreerrors, per-track exceptions). """
+        with self.lock:
+            self.counters["errors"] += 1
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+            record = self.track(info)
+            if record: record['error'] = stage
+
+    def on_progress(self, d):
+        """ yt-dlp progress hook side: a finished file adds its transfer time and size. """
+        if d.get('status') == 'error':
+            self.fail("download", d.get('info_dict'))
+        if d.get('status') != 'finished': return
+        downloaded = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        with self.lock:
+            self.stages["download"] += d.get('elapsed') or 0.0
+            self.bytes += downloaded
+            record = self.track(d.get('info_dict'))
+            if record:
+                record["download"] += d.get('elapsed') or 0.0
+                record['bytes'] += downloaded
+
+    def logger(self, quiet=False, count_errors=True):
+        return MetricsLogger(self, quiet, count_errors)
+
+    def summary(self):
+        """ One line for the status bar, e.g. 'network 8.1s (2.1MiB/s), ffmpeg 3.0s, tagging 0.4s'. """
+        with self.lock:
+            stages, data, counters = dict(self.stages), self.bytes, dict(self.counters)
+        parts = []
+        if stages["extract"] >= 0.05: parts.append(f"info {stages['extract']:.1f}s")
+        if stages["download"]:
+            rate = yt_dlp.utils.format_bytes(data / stages["download"])
+            parts.append(f"network {stages['download']:.1f}s ({rate}/s)")
+        if stages["transcode"] >= 0.05: parts.append(f"ffmpeg {stages['transcode']:.1f}s")
+        if stages["tag"] + stages["rename"] >= 0.05:
+            parts.append(f"tagging {stages['tag'] + stages['rename']:.1f}s")
+        if stages["loudness"] >= 0.05: parts.append(f"loudness {stages['loudness']:.1f}s")
+        if counters["retries"]: parts.append(f"{counters['retries']} retries")
+        if counters.get("throttled"): parts.append(f"throttled {counters['throttled']}x")
+        if counters["errors"]: parts.append(f"{counters['errors']} errors")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'stages': {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+                'bytes': self.bytes,
+                'counters': dict(self.counters),
+                'failures': dict(self.failures),
+                'tracks': [{k: round(v, 4) if isinstance(v, float) else v for k, v in record.items()}
+                           for record in self.tracks.values()],
+            }
+
+
+class MetricsLogger:
+    """
+    yt-dlp logger that counts what ignoreerrors would otherwise hide: retry warnings and
+    per-entry errors. Messages are still printed, minus the per-chunk progress lines.
+    """
+
+    def __init__(self, metrics, quiet=False, count_errors=True):
+        self.metrics = metrics
+        self.quiet = quiet
+        # Off where errors raise instead and the caller counts what finally failed
+        self.count_errors = count_errors
+
+    def debug(self, msg):
+        if self.quiet or msg.startswith('[debug] '): return
+        # Progress lines arrive here once per chunk when a logger is set
+        if msg.startswith('[download]') and '%' in msg: return
+        print(msg)
+
+    def warning(self, msg):
+        self.metrics.count("retries" if "Retrying" in msg else "warnings")
+        if not self.quiet: print(f"WARNING: {msg}", file=sys.stderr)
+
+    def error(self, msg):
+        if self.count_errors: self.metrics.fail("yt-dlp")
+        print(msg, file=sys.stderr)
+
+
+# --- HELPER CLASS: Metrics export ---
+class MetricsExporter:
+    """
+    Writes finished job results (with their RunMetrics) as JSON lines, and/or keeps process-wide
+    totals in a Prometheus text file (node_exporter textfile collector format). Either path may be None.
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.jobs = {}  # (mode, status) -> count
+        self.stages = dict.fromkeys(RunMetrics.STAGES, 0.0)
+        self.totals = {"bytes": 0, "tracks": 0}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def export(self, result):
+        metrics = result.get('metrics') or {}
+        with self.lock:
+            key = (result['mode'], result['status'])
+            self.jobs[key] = self.jobs.get(key, 0) + 1
+            for stage, seconds in (metrics.get('stages') or {}).items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            self.totals["bytes"] += metrics.get('bytes', 0)
+            self.totals["tracks"] += len(metrics.get('tracks') or [])
+            for name, value in (metrics.get('counters') or {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            try:
+                if self.jsonl_path:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({'time': time.time(), **result}) + "\n")
+                if self.prom_path:
+                    tmp = self.prom_path + ".tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        f.write(self.prometheus_text())
+                    os.replace(tmp, self.prom_path)
+            except OSError as e:
+                print(f"Metrics Error: {e}")
+
+    def prometheus_text(self):
+        lines = ["# HELP uyd_jobs_total Finished download jobs.", "# TYPE uyd_jobs_total counter"]
+        lines += [f'uyd_jobs_total{{mode="{mode}",status="{status}"}} {count}'
+                  for (mode, status), count in sorted(self.jobs.items())]
+        lines += ["# HELP uyd_stage_seconds_total Busy time per pipeline stage, summed over workers.",
+                  "# TYPE uyd_stage_seconds_total counter"]
+        lines += [f'uyd_stage_seconds_total{{stage="{stage}"}} {seconds:.3f}' for stage, seconds in self.stages.items()]
+        lines += ["# HELP uyd_download_bytes_total Bytes downloaded.", "# TYPE uyd_download_bytes_total counter",
+                  f"uyd_download_bytes_total {self.totals['bytes']}",
+                  "# HELP uyd_tracks_total Tracks seen by finished jobs.", "# TYPE uyd_tracks_total counter",
+                  f"uyd_tracks_total {self.totals['tracks']}"]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE uyd_{name}_total counter", f"uyd_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+
+# --- HELPER CLASS: Cover art ---
+class CoverArt:
+    """
+    Album cover normalized once per run: scaled down to max_size on its longest side and
+    re-encoded as JPEG, so every track embeds the same small buffer with the right MIME type.
+    A JPEG that already fits is kept byte for byte. Use from_file / from_thumbnail; both
+    return None (and print why) when there is no usable image.
+    """
+
+    def __init__(self, data, mime="image/jpeg"):
+        self.data = data
+        self.mime = mime
+        self._picture = None
+
+    @classmethod
+    def from_bytes(cls, raw, max_size=COVER_MAX_SIZE, quality=COVER_JPEG_QUALITY, square=False):
+        from io import BytesIO
+        from PIL import Image
+
+        image = Image.open(BytesIO(raw))
+        if square and image.width != image.height:
+            # Video thumbnails are 16:9 frames; album art is square
+            side = min(image.size)
+            left, top = (image.width - side) // 2, (image.height - side) // 2
+            image = image.crop((left, top, left + side, top + side))
+        elif image.format == "JPEG" and max(image.size) <= max_size:
+            return cls(raw, "image/jpeg")
+
+        if image.mode not in ("RGB", "L"):
+            # JPEG has no alpha; transparent PNG covers go onto white instead of black
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True)
+        return cls(buffer.getvalue(), "image/jpeg")
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        try:
+            with open(path, 'rb') as albumart:
+                return cls.from_bytes(albumart.read(), **kwargs)
+        except Exception as e:
+            print(f"Cover Art Error: {e}")
+            return None
+
+    @classmethod
+    def from_thumbnail(cls, info, timeout=(5, 15), **kwargs):
+        """ Cover cut from the largest playlist (or first entry) thumbnail, None when there is none. """
+        url = cls.thumbnail_url(info)
+        if not url: return None
+        try:
+            response = requests.get(url, timeout=timeout)
+            response.raise_for_status()
+            return cls.from_bytes(response.content, square=True, **kwargs)
+        except Exception as e:
+            print(f"Cover Art Error: {e}")
+            return None
+
+    @staticmethod
+    def thumbnail_url(info):
+        for source in (info, next((e for e in info.get('entries') or [] if e), None)):
+            if not source: continue
+            thumbnails = [t for t in source.get('thumbnails') or [] if t.get('url')]
+            if thumbnails:
+                # Unsized entries rank by yt-dlp's preference order, which lists the best last
+                return max(enumerate(thumbnails), key=lambda it: ((it[1].get('width') or 0) *
+                                                                 (it[1].get('height') or 0), it[0]))[1]['url']
+            if source.get('thumbnail'):
+                return source['thumbnail']
+            if source is not info and source.get('id') and source.get('ie_key', 'Youtube') == 'Youtube':
+                return f"https://i.ytimg.com/vi/{source['id']}/hqdefault.jpg"
+        return None
+
+    @property
+    def picture(self):
+        """ base64 FLAC picture block for Vorbis comments (metadata_block_picture). """
+        if self._picture is None:
+            picture = Picture()
+            picture.type, picture.mime, picture.desc, picture.data = 3, self.mime, "Cover", self.data
+            self._picture = base64.b64encode(picture.write()).decode("ascii")
+        return self._picture
+
+
+# --- HELPER CLASS: Album tagging engine ---
+class AlbumTagger:
+    """
+    Tags and renames album tracks. The complete tag set (text plus cover) is built in memory
+    and written to each file in a single save: ID3 for MP3, iTunes atoms for M4A, Vorbis
+    comments for Opus/Ogg. The cover is prepared once (see CoverArt) and files are processed
+    across a thread pool.
+    """
+
+    def __init__(self, artist, album, year, cover_path="", workers=TAG_WORKERS, metrics=None,
+                 cover_max_size=COVER_MAX_SIZE):
+        self.artist = artist
+        self.album = album
+        self.year = year
+        self.workers = workers
+        self.metrics = metrics or RunMetrics()
+        self.cover = None
+        self.cover_max_size = cover_max_size
+        if cover_path and os.path.exists(cover_path):
+            with self.metrics.stage("tag"):
+                self.cover = CoverArt.from_file(cover_path, max_size=cover_max_size)
+
+    @property
+    def cover_data(self):
+        return self.cover.data if self.cover else None
+
+    def build_tags(self, title, track_number=""):
+        tags = ID3()
+        if self.artist: tags.add(TPE1(encoding=3, text=self.artist))
+        if self.album: tags.add(TALB(encoding=3, text=self.album))
+        if self.year: tags.add(TDRC(encoding=3, text=self.year))
+        if track_number: tags.add(TRCK(encoding=3, text=track_number))
+        tags.add(TIT2(encoding=3, text=title))
+        if self.cover_data:
+            tags.add(APIC(encoding=3, mime=self.cover.mime, type=3, desc=u'Cover', data=self.cover_data))
+        return tags
+
+    def tag_mp4(self, filepath, title, track_number=""):
+        audio = MP4(filepath)
+        if audio.tags is None: audio.add_tags()
+        audio.tags.clear()
+        if self.artist: audio["\xa9ART"] = [self.artist]
+        if self.album: audio["\xa9alb"] = [self.album]
+        if self.year: audio["\xa9day"] = [self.year]
+        if track_number: audio["trkn"] = [(int(track_number), 0)]
+        audio["\xa9nam"] = [title]
+        if self.cover_data:
+            image_format = MP4Cover.FORMAT_PNG if self.cover.mime == "image/png" else MP4Cover.FORMAT_JPEG
+            audio["covr"] = [MP4Cover(self.cover_data, imageformat=image_format)]
+        audio.save()
+
+    def tag_vorbis(self, filepath, title, track_number=""):
+        audio = mutagen.File(filepath)
+        if audio is None:
+            raise ValueError(f"not an Ogg audio file: {filepath}")
+        audio.tags.clear()
+        if self.artist: audio["artist"] = self.artist
+        if self.album: audio["album"] = self.album
+        if self.year: audio["date"] = self.year
+        if track_number: audio["tracknumber"] = str(int(track_number))
+        audio["title"] = title
+        if self.cover: audio["metadata_block_picture"] = self.cover.picture
+        audio.save()
+
+    @staticmethod
+    def write_loudness(filepath, values):
+        """
+        ReplayGain 2.0 tags from loudness.replaygain() values, added to the existing tags.
+        Opus players read R128_* gains instead (relative to -23 LUFS, on top of the header gain).
+        """
+        text = {
+            "REPLAYGAIN_TRACK_GAIN": f"{values['track_gain']:+.2f} dB",
+            "REPLAYGAIN_TRACK_PEAK": f"{values['track_peak']:.6f}",
+            "REPLAYGAIN_ALBUM_GAIN": f"{values['album_gain']:+.2f} dB",
+            "REPLAYGAIN_ALBUM_PEAK": f"{values['album_peak']:.6f}",
+        }
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext in (".m4a", ".mp4"):
+            audio = MP4(filepath)
+            if audio.tags is None: audio.add_tags()
+            for key, value in text.items():
+                audio.tags[f"----:com.apple.iTunes:{key.lower()}"] = [MP4FreeForm(value.encode("utf-8"))]
+        elif ext == ".opus":
+            audio = mutagen.File(filepath)
+            audio["R128_TRACK_GAIN"] = str(values['r128_track_gain'])
+            audio["R128_ALBUM_GAIN"] = str(values['r128_album_gain'])
+        elif ext == ".ogg":
+            audio = mutagen.File(filepath)
+            audio.update(text)
+        else:
+            audio = ID3(filepath)
+            for key, value in text.items():
+                audio.delall(f"TXXX:{key}")
+                audio.add(TXXX(encoding=3, desc=key, text=value))
+        audio.save()
+
+    def tag_file(self, filepath, title, track_number="", new_path=None, info=None):
+        """ Writes all tags in one pass, then renames. Returns the final path. """
+        ext = os.path.splitext(filepath)[1].lower()
+        with self.metrics.stage("tag", info):
+            if ext in (".m4a", ".mp4"):
+                self.tag_mp4(filepath, title, track_number)
+            elif ext in (".opus", ".ogg"):
+                self.tag_vorbis(filepath, title, track_number)
+            else:
+                self.build_tags(title, track_number).save(filepath)
+        if new_path and new_path != filepath and not os.path.exists(new_path):
+            with self.metrics.stage("rename", info):
+                os.rename(filepath, new_path)
+            return new_path
+        return filepath
+
+    def tag_info(self, info, namer):
+        """ Tags one finished track from its yt-dlp info dict; namer(info) -> (title, track_number, filename). """
+        filepath = info['filepath']
+        title, track_number, filename = namer(info)
+        new_path = os.path.join(os.path.dirname(filepath), filename)
+        info['filepath'] = self.tag_file(filepath, title, track_number, new_path, info)
+        return info
+
+    def tag_many(self, jobs, on_progress=None):
+        """
+        jobs: iterable of (filepath, title, track_number, new_path).
+        on_progress(done, total) is called from the worker threads as files complete.
+        """
+        jobs = list(jobs)
+        done = 0
+        lock = threading.Lock()
+
+        def run(job):
+            nonlocal done
+            try:
+                return self.tag_file(*job)
+            except Exception as e:
+                print(f"Tag Error: {e}")
+                self.metrics.fail("tag")
+                return None
+            finally:
+                with lock:
+                    done += 1
+                    count = done
+                if on_progress: on_progress(count, len(jobs))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(run, jobs))
+
+
+# --- HELPER CLASS: Audio output policy ---
+class AudioOutput:
+    """
+    Decides per downloaded source whether the audio stream can be copied into the target
+    container (a remux: no decode, no quality loss, next to no CPU) or has to be encoded at kbps.
+    target is a key of AUDIO_FORMATS, or 'original' to keep the source codec in whichever
+    container holds it and only encode (to MP3) when none does.
+    """
+
+    TARGETS = ("mp3", "m4a", "opus", "original")
+
+    def __init__(self, target="mp3", kbps=192):
+        if target not in self.TARGETS:
+            raise ValueError(f"audio format must be one of {', '.join(self.TARGETS)}, not {target!r}")
+        self.target = target
+        self.kbps = kbps
+
+    @property
+    def variant(self):
+        """ Media index key: files of the same variant are interchangeable. """
+        return "original" if self.target == "original" else f"{self.target}-{self.kbps}"
+
+    def format_selector(self):
+        """ yt-dlp format string preferring sources the target can take without re-encoding. """
+        if self.target == "original":
+            return 'bestaudio/best'
+        preferred = [f'bestaudio[acodec^={codec}]' for codec in AUDIO_FORMATS[self.target]["copy"]]
+        return "/".join(preferred + ['bestaudio/best'])
+
+    @staticmethod
+    def source_codec(info):
+        return (info.get('acodec') or "").split(".")[0].lower()
+
+    def plan(self, info):
+        """ (format name, copy) for a source: copy is True when the stream goes in unchanged. """
+        codec = self.source_codec(info)
+        if self.target == "original":
+            for name, spec in AUDIO_FORMATS.items():
+                if codec in spec["copy"]:
+                    return name, True
+            return "mp3", False
+        return self.target, codec in AUDIO_FORMATS[self.target]["copy"]
+
+    def output_path(self, path, info):
+        name, _ = self.plan(info)
+        return os.path.splitext(path)[0] + "." + AUDIO_FORMATS[name]["ext"]
+
+    def ffmpeg_args(self, info):
+        """ Everything between ffmpeg's input and output for this source. """
+        name, copy = self.plan(info)
+        spec = AUDIO_FORMATS[name]
+        codec = ["-codec:a", "copy"] if copy else ["-codec:a", spec["encoder"], "-b:a", f"{self.kbps}k"]
+        return ["-vn", *codec, "-f", spec["muxer"]]
+
+
+# --- HELPER CLASS: Transcode stage ---
+class TranscodePool:
+    """
+    Audio output stage decoupled from the network: downloaded source files are queued
+    and remuxed or encoded (as the AudioOutput decides) by a pool of ffmpeg workers, so the
+    next download starts while earlier tracks encode on other cores. The queue is bounded;
+    when the encoders fall behind, submit() blocks and the downloads wait instead of piling
+    up source files. on_done(info) is called from the worker thread with info['filepath']
+    pointing at the finished file.
+    """
+
+    def __init__(self, ffmpeg_path, output, on_done=None, cancel_token=None, workers=TRANSCODE_WORKERS,
+                 metrics=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.output = output
+        self.on_done = on_done
+        self.cancel_token = cancel_token or CancelToken()
+        self.metrics = metrics or RunMetrics()
+        self.queue = queue.Queue(maxsize=workers * 2)
+        self.workers = workers
+        self.pending = 0  # submitted and not finished yet (queued or encoding)
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, info):
+        if self.cancel_token.cancelled:
+            self._discard(info)
+            return
+        with self.lock:
+            self.pending += 1
+        self.queue.put(info)
+
+    def close(self):
+        """ Waits for every queued track to finish encoding. """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _worker(self):
+        while True:
+            info = self.queue.get()
+            if info is None: break
+            try:
+                if self.cancel_token.cancelled:
+                    self._discard(info)
+                    continue
+                with self.metrics.stage("transcode", info):
+                    self.transcode(info)
+                if self.on_done: self.on_done(info)
+            except UserCancelled:
+                self._discard(info)
+            except Exception as e:
+                print(f"Transcode Error: {e}")
+                self.metrics.fail("transcode", info)
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+    def backlog(self):
+        """ (seconds to work off the queued tracks, seconds per track), None before the first track. """
+        done = self.metrics.counters.get("remuxes", 0) + self.metrics.counters.get("encodes", 0)
+        if not done: return None
+        per_track = self.metrics.stages["transcode"] / done
+        return self.pending * per_track / self.workers, per_track
+
+    @staticmethod
+    def _discard(info):
+        """ Source files of a cancelled run are intermediates; don't leave them behind. """
+        try:
+            os.remove(info['filepath'])
+        except OSError:
+            pass
+
+    def transcode(self, info):
+        src = info['filepath']
+        dst = self.output.output_path(src, info)
+        name, copy = self.output.plan(info)
+        self.metrics.count("remuxes" if copy else "encodes")
+        if copy and src == dst:
+            # Already the right codec in the right container (e.g. an .m4a for M4A output)
+            info['ext'] = AUDIO_FORMATS[name]["ext"]
+            return
+
+        tmp = dst + ".part"
+        proc = subprocess.Popen([self.ffmpeg_path, "-y", "-loglevel", "error", "-i", src,
+                                 *self.output.ffmpeg_args(info), tmp],
+                                stdin=subprocess.DEVNULL, creationflags=SUBPROCESS_FLAGS)
+        handle = self.cancel_token.register(proc.kill)
+        try:
+            returncode = proc.wait()
+        finally:
+            self.cancel_token.unregister(handle)
+
+        if self.cancel_token.cancelled or returncode != 0:
+            if os.path.exists(tmp): os.remove(tmp)
+            self.cancel_token.check()
+            raise RuntimeError(f"ffmpeg exited with code {returncode}")
+        os.replace(tmp, dst)
+        if src != dst:
+            os.remove(src)
+        info['filepath'] = dst
+        info['ext'] = AUDIO_FORMATS[name]["ext"]
+
+
+class TrackDonePP(yt_dlp.postprocessor.PostProcessor):
+    """ Last yt-dlp postprocessor of a download: hands a copy of the finished track to a callback. """
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def run(self, info):
+        self.callback(dict(info))
+        return [], info
+
+
+# --- HELPER CLASS: Per-folder library index ---
+class LibraryIndex:
+    """
+    Small JSON index kept inside a playlist/album folder: video ID -> filename, size,
+    tag state and playlist position. Sync mode uses it to fetch only new or changed entries.
+    """
+
+    FILENAME = ".ytdl_index.json"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, self.FILENAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def exists(cls, folder):
+        return os.path.exists(os.path.join(folder, cls.FILENAME))
+
+    def get(self, video_id):
+        with self.lock:
+            return dict(self.entries.get(video_id) or {})
+
+    def ids(self):
+        with self.lock:
+            return set(self.entries)
+
+    def existing_path(self, video_id):
+        """ Path of the indexed file if it is still on disk with the recorded size. """
+        record = self.get(video_id)
+        if not record: return None
+        path = os.path.join(self.folder, record['filename'])
+        if os.path.exists(path) and os.path.getsize(path) == record.get('size'):
+            return path
+        return None
+
+    def record(self, video_id, filepath, tagged=False, playlist_index=None, title=None):
+        with self.lock:
+            self.entries[video_id] = {
+                'filename': os.path.basename(filepath),
+                'size': os.path.getsize(filepath),
+                'tagged': tagged,
+                'playlist_index': playlist_index,
+                'title': title,
+            }
+        self.save()
+
+    def remove(self, video_id, delete_file=False):
+        with self.lock:
+            record = self.entries.pop(video_id, None)
+        if record and delete_file:
+            try:
+                os.remove(os.path.join(self.folder, record['filename']))
+            except OSError:
+                pass
+        self.save()
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({"version": 1, "entries": self.entries}, indent=1)
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"Index Error: {e}")
+
+
+# --- HELPER CLASS: Library-wide de-duplication index ---
+class MediaIndex:
+    """
+    SQLite index of every finished file across all download folders, keyed by video ID and
+    output variant (e.g. 'mp3-192', 'mp4-1080'), noting whether the file was tagged as an
+    album track. A hit is placed into the new folder by hardlink, or by copy when the new file
+    is going to be retagged, instead of being downloaded and transcoded again.
+    """
+
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS media ("
+                              "video_id TEXT, variant TEXT, path TEXT, size INTEGER, album INTEGER, "
+                              "PRIMARY KEY (video_id, variant))")
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(media)")]
+            if "album" not in columns:
+                # Rows from before the column are NULL: unknown, so treated as album tracks
+                self.conn.execute("ALTER TABLE media ADD COLUMN album INTEGER")
+
+    def add(self, video_id, variant, path, album=False):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)",
+                              (video_id, variant, os.path.abspath(path), os.path.getsize(path), int(album)))
+
+    def find(self, video_id, variant):
+        """
+        (path, album) of a known copy that is still on disk unchanged, or None; stale rows are dropped.
+        album is False only for files known not to carry album tags.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT path, size, album FROM media WHERE video_id = ? AND variant = ?",
+                                    (video_id, variant)).fetchone()
+        if not row: return None
+        path, size, album = row
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            return path, album != 0
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM media WHERE video_id = ? AND variant = ?", (video_id, variant))
+        return None
+
+    @staticmethod
+    def materialize(src, dst, link=True):
+        """ Hardlinks src to dst when allowed and possible, otherwise copies it. """
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        if link:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copy2(src, dst)
+
+
+# --- HELPER CLASS: Streaming transcode ---
+class StreamingTranscoder:
+    """
+    Pipes an audio format's bytes from HTTP straight into ffmpeg's stdin, so the output file is
+    written without a temporary webm/m4a on disk and encoding (or remuxing, as the AudioOutput
+    decides) starts with the first chunk.
+    Only plain http(s) formats qualify; fragmented (DASH/HLS) formats take the normal path.
+    """
+
+    # YouTube throttles single open-ended range requests, so fetch in bounded ranges like yt-dlp does
+    CHUNK_SIZE = 10 * 1024 * 1024
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, ffmpeg_path, output, cancel_token=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.output = output
+        self.cancel_token = cancel_token or CancelToken()
+        self.session = requests.Session()
+
+    @staticmethod
+    def can_stream(info):
+        return bool(info.get('url')) and info.get('protocol') in ('http', 'https') \
+            and not info.get('requested_formats')
+
+    def run(self, info, dst, progress_hooks=None):
+        """ Downloads and encodes into dst. Progress dicts mimic yt-dlp's so the same hooks work. """
+        tmp = dst + ".part"
+        # yt-dlp creates the output folder on its own download path; this one bypasses it
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        proc = subprocess.Popen([self.ffmpeg_path, "-y", "-loglevel", "error", "-i", "pipe:0",
+                                 *self.output.ffmpeg_args(info), tmp],
+                                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                creationflags=SUBPROCESS_FLAGS)
+        handle = self.cancel_token.register(proc.kill)
+        started = time.time()
+        try:
+            downloaded = self._pipe(info, proc.stdin, progress_hooks or [])
+            proc.stdin.close()
+            if proc.wait() != 0:
+                self.cancel_token.check()
+                raise RuntimeError(f"ffmpeg exited with code {proc.returncode}")
+        except BaseException as e:
+            proc.kill()
+            proc.wait()
+            if os.path.exists(tmp): os.remove(tmp)
+            # A killed ffmpeg or closed stream surfaces as a pipe/connection error; report it as the cancel it was
+            if self.cancel_token.cancelled and not isinstance(e, UserCancelled):
+                raise UserCancelled() from e
+            raise
+        finally:
+            self.cancel_token.unregister(handle)
+
+        os.replace(tmp, dst)
+        info['filepath'] = dst
+        info['ext'] = os.path.splitext(dst)[1][1:]
+        for hook in progress_hooks or []:
+            # elapsed covers download and encode together, they overlap in the pipe
+            hook({'status': 'finished', 'downloaded_bytes': downloaded, 'total_bytes': downloaded,
+                  'filename': dst, 'info_dict': info, 'elapsed': time.time() - started})
+
+    def _pipe(self, info, sink, progress_hooks):
+        headers = dict(info.get('http_headers') or {})
+        total = info.get('filesize')
+        downloaded = 0
+        started = time.time()
+
+        while not total or downloaded < total:
+            end = downloaded + self.CHUNK_SIZE - 1
+            if total: end = min(end, total - 1)
+            self.cancel_token.check()
+            with self.session.get(info['url'], headers={**headers, 'Range': f"bytes={downloaded}-{end}"},
+                                  stream=True, timeout=(10, 30)) as response:
+                if response.status_code == 416: break
+                response.raise_for_status()
+                if not total:
+                    content_range = response.headers.get('Content-Range', '')
+                    if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+                        total = int(content_range.rsplit('/', 1)[1])
+
+                # 200 means the server ignored Range and sends everything again from byte 0;
+                # what the sink already has must not go in a second time
+                skip = downloaded if response.status_code == 200 else 0
+                received = 0
+                handle = self.cancel_token.register(response.close)
+                try:
+                    for chunk in response.iter_content(self.READ_SIZE):
+                        if skip:
+                            chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                            if not chunk: continue
+                        sink.write(chunk)
+                        received += len(chunk)
+                        downloaded += len(chunk)
+                        speed = downloaded / max(time.time() - started, 1e-3)
+                        for hook in progress_hooks:
+                            hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total,
+                                  'speed': speed, 'info_dict': info,
+                                  '_percent_str': f"{downloaded * 100 / total:.1f}%" if total else "0%",
+                                  '_speed_str': f"{yt_dlp.utils.format_bytes(speed)}/s",
+                                  '_eta_str': f"{int((total - downloaded) / speed)}s" if total else "?"})
+                finally:
+                    self.cancel_token.unregister(handle)
+
+            # After a 200 the whole stream has been read
+            if response.status_code == 200 or received == 0: break
+        return downloaded
+
+
+# --- HELPER CLASS: Segmented download ---
+class SegmentedHttpFD(HttpFD):
+    """
+    yt-dlp HTTP downloader that fetches one large stream as byte-range segments over a pool of
+    keep-alive connections, writing each segment in place into a preallocated .part file.
+    Throttling is per connection, so more connections add up. The pool starts small and doubles
+    while that still raises the measured throughput; when a step adds nothing, it goes back to
+    the previous size and stays there. Streams of unknown size, small streams, proxies, rate limits and servers
+    that ignore Range fall back to the regular single-connection HttpFD.
+    Finished segments are listed in a .part.ranges file next to the .part, so an interrupted
+    download resumes with the segments it is missing; a .part without one (left by HttpFD)
+    is resumed by HttpFD.
+    """
+
+    SEGMENT_SIZE = 4 * 1024 * 1024
+    MIN_SIZE = 16 * 1024 * 1024
+    READ_SIZE = 64 * 1024
+    INITIAL_CONNECTIONS = 2
+    # Seconds between throughput samples, and the gain that justifies growing the pool
+    ADAPT_INTERVAL = 0.5
+    ADAPT_GAIN = 1.2
+
+    class NoRanges(Exception):
+        pass
+
+    def __init__(self, ydl, params, max_connections=8, cancel_token=None):
+        super().__init__(ydl, params)
+        self.max_connections = max_connections
+        self.cancel_token = cancel_token or CancelToken()
+
+    def can_segment(self, info):
+        total = info.get('filesize')
+        return (self.max_connections > 1 and total and total >= self.MIN_SIZE
+                and info.get('protocol') in ('http', 'https') and not info.get('request_data')
+                and not self.params.get('proxy') and not self.params.get('ratelimit')
+                and not self.params.get('test'))
+
+    def real_download(self, filename, info_dict):
+        if not self.can_segment(info_dict):
+            return super().real_download(filename, info_dict)
+        tmp = self.temp_name(filename)
+        if self.params.get('continuedl', True) and not os.path.isfile(tmp + ".ranges") \
+                and os.path.isfile(tmp) and os.path.getsize(tmp) < info_dict['filesize']:
+            self.to_screen("[download] Resuming a single-connection partial file")
+            return super().real_download(filename, info_dict)
+        try:
+            return self.segmented_download(filename, info_dict)
+        except self.NoRanges:
+            self.to_screen("[download] Server ignores Range requests, using a single connection")
+            return super().real_download(filename, info_dict)
+
+    def segmented_download(self, filename, info_dict):
+        total = info_dict['filesize']
+        tmp = self.temp_name(filename)
+        ranges = tmp + ".ranges"
+        done = set()
+        if self.params.get('continuedl', True) and os.path.isfile(ranges) \
+                and os.path.isfile(tmp) and os.path.getsize(tmp) == total:
+            with open(ranges, 'r', encoding='utf-8') as f:
+                done = {int(line) for line in f if line.strip().isdigit()}
+            self.to_screen(f"[download] Resuming with {len(done)} finished segments")
+        else:
+            # Preallocate, so every segment can be written at its offset as it arrives
+            with open(tmp, 'wb') as f:
+                f.truncate(total)
+            open(ranges, 'w', encoding='utf-8').close()
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        headers = {**(info_dict.get('http_headers') or {}), 'Accept-Encoding': 'identity'}
+        retries = self.params.get('retries', 10)
+
+        segments = queue.Queue()
+        resumed = 0
+        for start in range(0, total, self.SEGMENT_SIZE):
+            end = min(start + self.SEGMENT_SIZE, total) - 1
+            if start in done:
+                resumed += end - start + 1
+            else:
+                segments.put((start, end))
+        lock = threading.Lock()
+        stop = threading.Event()
+        state = {'downloaded': resumed, 'target': self.INITIAL_CONNECTIONS, 'active': 0, 'error': None}
+        ranges_file = open(ranges, 'a', encoding='utf-8')
+
+        def fetch(out, start, end):
+            position = start
+            for attempt in itertools.count():
+                try:
+                    with session.get(info_dict['url'], headers={**headers, 'Range': f"bytes={position}-{end}"},
+                                     stream=True, timeout=(10, 30)) as response:
+                        if response.status_code == 200: raise self.NoRanges()
+                        response.raise_for_status()
+                        out.seek(position)
+                        for chunk in response.iter_content(self.READ_SIZE):
+                            if stop.is_set(): return
+                            out.write(chunk)
+                            position += len(chunk)
+                            with lock:
+                                state['downloaded'] += len(chunk)
+                    if position > end:
+                        out.flush()
+                        with lock:
+                            ranges_file.write(f"{start}\n")
+                            ranges_file.flush()
+                        return
+                    raise requests.exceptions.ConnectionError(f"segment ended at {position} of {end + 1}")
+                except (requests.exceptions.RequestException, OSError) as e:
+                    if attempt >= retries or stop.is_set(): raise
+                    self.report_retry(e, attempt + 1, retries)
+                    stop.wait(min(2 ** attempt * 0.5, 10))
+
+        def worker():
+            counted = True
+            try:
+                with open(tmp, 'r+b') as out:
+                    while not stop.is_set():
+                        with lock:
+                            # The pool shrinks by letting workers above the target finish. Leaving counts
+                            # down in the same locked step, so a shrink never lets more workers go than intended
+                            if state['active'] > state['target']:
+                                state['active'] -= 1
+                                counted = False
+                                return
+                        try:
+                            start, end = segments.get_nowait()
+                        except queue.Empty:
+                            return
+                        fetch(out, start, end)
+            except Exception as e:
+                with lock:
+                    state['error'] = state['error'] or e
+                stop.set()
+            finally:
+                if counted:
+                    with lock:
+                        state['active'] -= 1
+
+        threads = []
+
+        def spawn():
+            with lock:
+                state['active'] += 1
+            thread = threading.Thread(target=worker, daemon=True)
+            threads.append(thread)
+            thread.start()
+
+        handle = self.cancel_token.register(stop.set)
+        started = last_sample = time.time()
+        sampled_bytes, best_rate, previous_target = resumed, 0.0, None
+        try:
+            for _ in range(min(state['target'], segments.qsize())):
+                spawn()
+            while any(thread.is_alive() for thread in threads):
+                stop.wait(0.25)
+                self.cancel_token.check()
+                now = time.time()
+                with lock:
+                    downloaded = state['downloaded']
+                speed = self.calc_speed(started, now, downloaded - resumed)
+                self._hook_progress({
+                    'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total,
+                    'tmpfilename': tmp, 'filename': filename, 'speed': speed, 'elapsed': now - started,
+                    'eta': self.calc_eta(speed, total - downloaded), 'ctx_id': info_dict.get('ctx_id'),
+                }, info_dict)
+
+                if now - last_sample < self.ADAPT_INTERVAL or stop.is_set(): continue
+                rate = (downloaded - sampled_bytes) / (now - last_sample)
+                last_sample, sampled_bytes = now, downloaded
+                if previous_target == 0 or not rate: continue
+                if rate > best_rate * self.ADAPT_GAIN:
+                    best_rate = rate
+                    previous_target = state['target']
+                    state['target'] = min(self.max_connections, state['target'] * 2)
+                    for _ in range(min(state['target'] - state['active'], segments.qsize())):
+                        spawn()
+                else:
+                    # The last step added nothing; the extra workers finish their segment and stop
+                    state['target'] = previous_target or state['target']
+                    previous_target = 0
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.cancel_token.unregister(handle)
+            session.close()
+            ranges_file.close()
+
+        if state['error']:
+            if isinstance(state['error'], self.NoRanges):
+                os.remove(tmp)
+                os.remove(ranges)
+            raise state['error']
+        self.cancel_token.check()
+        # The .part is preallocated: a segment nobody fetched would leave a zero-filled hole
+        if not segments.empty() or state['downloaded'] != total:
+            raise yt_dlp.utils.ContentTooShortError(state['downloaded'], total)
+        self.ydl.write_debug(f"[download] {filename}: {total} bytes, settled on {state['target']} connections")
+
+        self.try_rename(tmp, filename)
+        os.remove(ranges)
+        self._hook_progress({
+            'status': 'finished', 'downloaded_bytes': total, 'total_bytes': total, 'filename': filename,
+            'elapsed': time.time() - started, 'ctx_id': info_dict.get('ctx_id'),
+        }, info_dict)
+        return True
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """ YoutubeDL whose plain http(s) format downloads go through SegmentedHttpFD. """
+
+    def __init__(self, params, max_connections=8, cancel_token=None):
+        super().__init__(params)
+        self.max_connections = max_connections
+        self.cancel_token = cancel_token
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle or name == '-' or info.get('protocol') not in ('http', 'https') \
+                or self.params.get('external_downloader'):
+            return super().dl(name, info, subtitle, test)
+        fd = SegmentedHttpFD(self, self.params, self.max_connections, self.cancel_token)
+        for hook in self._progress_hooks:
+            fd.add_progress_hook(hook)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+
+
+# --- HELPER CLASS: Aggregate playlist progress ---
+class PlaylistProgress:
+    """
+    Thread-safe roll-up of a playlist run, weighted by bytes rather than by entry. Each entry
+    expects the size of its resolved formats once the prefetch (or its own download) knows it;
+    until then its flat-extraction duration at the bytes per second of the entries known so far.
+    Without any sizes yet, every entry counts as an equal share, as before.
+    """
+
+    # Seconds of history behind the job's throughput
+    SPEED_WINDOW = 10.0
+
+    def __init__(self, jobs):
+        self.indices = [index for index, _ in jobs]
+        self.durations = {index: entry.get('duration') for index, entry in jobs}
+        self.expected = {}
+        self.current = {}   # bytes of the file being downloaded, per entry
+        self.finished_bytes = {}  # bytes of finished files (an entry can have video + audio)
+        self.finished = set()
+        self.discarded = 0  # bytes of attempts that failed and are downloaded again
+        self.samples = []  # (time, bytes transferred); the throughput clock starts with the first byte
+        self.lock = threading.Lock()
+
+    def expect(self, index, size):
+        """ Expected bytes of one entry (from the prefetch). """
+        with self.lock:
+            if size and index not in self.finished:
+                self.expected[index] = size
+
+    def restart(self, index):
+        """ A failed entry goes back in the queue: what its attempt got so far stops counting as done. """
+        with self.lock:
+            self.discarded += self.finished_bytes.pop(index, 0) + self.current.pop(index, 0)
+
+    @staticmethod
+    def entry_size(info):
+        """ Expected download size of a resolved entry, None when nothing hints at it. """
+        size = 0
+        for f in info.get('requested_formats') or [info]:
+            known = f.get('filesize') or f.get('filesize_approx')
+            if not known and f.get('tbr') and info.get('duration'):
+                known = f['tbr'] * 1000 / 8 * info['duration']
+            if not known: return None
+            size += known
+        return int(size) or None
+
+    def update(self, index, d):
+        """
+        Feed a yt-dlp progress dict for one entry ({'status': 'finished'} without bytes closes the entry).
+        Returns (fraction, finished_count, speed, eta, done_bytes, total_bytes); eta and total are
+        None while nothing is known about sizes.
+        """
+        with self.lock:
+            status = d['status']
+            if status == 'downloading':
+                self.current[index] = d.get('downloaded_bytes') or 0
+                reported = d.get('total_bytes') or d.get('total_bytes_estimate')
+                if reported:
+                    self.expected[index] = max(self.expected.get(index, 0),
+                                               self.finished_bytes.get(index, 0) + reported)
+            elif status == 'finished' and (d.get('total_bytes') or d.get('downloaded_bytes')):
+                self.finished_bytes[index] = self.finished_bytes.get(index, 0) + \
+                    (d.get('total_bytes') or d.get('downloaded_bytes'))
+                self.current[index] = 0
+            elif status in ('finished', 'error'):
+                self.finished.add(index)
+                self.current[index] = 0
+                # What arrived is what this entry weighs (nothing, for one that failed)
+                self.expected[index] = self.finished_bytes.get(index, 0)
+            return self._snapshot()
+
+    def _snapshot(self):
+        done = sum(self.finished_bytes.values()) + sum(self.current.values())
+        transferred = done + self.discarded
+        now = time.time()
+        if transferred: self.samples.append((now, transferred))
+        while len(self.samples) > 2 and now - self.samples[1][0] > self.SPEED_WINDOW:
+            self.samples.pop(0)
+        then, before = self.samples[0] if self.samples else (now, transferred)
+        speed = max(0, transferred - before) / (now - then) if now > then else 0
+
+        total = self._expected_total()
+        if total is None:
+            return len(self.finished) / max(len(self.indices), 1), len(self.finished), speed, None, done, None
+        total = max(total, done)
+        eta = (total - done) / speed if speed else None
+        return (done / total if total else 1.0), len(self.finished), speed, eta, done, total
+
+    def _expected_total(self):
+        known = {i: size for i, size in self.expected.items() if i not in self.finished and size}
+        sized = [(size, self.durations[i]) for i, size in known.items() if self.durations.get(i)]
+        rate = sum(size for size, _ in sized) / sum(duration for _, duration in sized) if sized else None
+        if not known and not self.finished_bytes: return None
+        sizes = list(known.values()) or [self.expected[i] for i in self.finished if self.expected.get(i)]
+        average = sum(sizes) / len(sizes) if sizes else 0
+
+        total = 0
+        for index in self.indices:
+            if index in self.finished:
+                total += self.expected.get(index, 0)
+            elif index in known:
+                total += known[index]
+            elif rate and self.durations.get(index):
+                total += rate * self.durations[index]
+            else:
+                total += average
+        return total
+
+
+# --- HELPER CLASS: Per-host request pacing ---
+class HostLimiter:
+    """
+    AIMD concurrency and pacing per host for the entries of one playlist run (the host of the
+    entry's page; YouTube throttles per client, not per stream). A host starts with `limit`
+    entries at a time and no gap between them. A throttling response halves its concurrency,
+    doubles the gap between request starts and pauses the host (for the Retry-After when the
+    server sent one); every success after that adds back a fraction of a slot and shortens the
+    gap, so the run settles just below the rate the server accepts.
+    """
+
+    def __init__(self, limit, cancel_token=None):
+        self.max_limit = max(1, limit)
+        self.cancel_token = cancel_token or CancelToken()
+        self.cond = threading.Condition()
+        self.hosts = {}
+
+    def _host(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {'limit': float(self.max_limit), 'active': 0, 'interval': 0.0,
+                                        'next_start': 0.0, 'calm_after': 0.0, 'throttles': 0}
+        return state
+
+    @contextmanager
+    def slot(self, host):
+        """ Holds one of the host's slots, once one is free and the host's pacing allows another start. """
+        with self.cond:
+            state = self._host(host)
+            while True:
+                self.cancel_token.check()
+                now = time.time()
+                if state['active'] < int(state['limit']):
+                    if now >= state['next_start']: break
+                    wait_for = state['next_start'] - now
+                else:
+                    wait_for = 0.5
+                # Bounded, so a cancel is noticed
+                self.cond.wait(min(wait_for, 0.5))
+            state['active'] += 1
+            state['next_start'] = now + state['interval']
+        try:
+            yield
+        finally:
+            with self.cond:
+                state['active'] -= 1
+                self.cond.notify_all()
+
+    def success(self, host):
+        with self.cond:
+            state = self._host(host)
+            state['limit'] = min(self.max_limit, state['limit'] + 1 / state['limit'])
+            state['interval'] *= THROTTLE_RECOVERY
+            if state['interval'] < THROTTLE_MIN_INTERVAL / 8: state['interval'] = 0.0
+            self.cond.notify_all()
+
+    def throttled(self, host, retry_after=None):
+        with self.cond:
+            state = self._host(host)
+            now = time.time()
+            # Requests that were already in flight fail together: one cut per pause
+            if now >= state['calm_after']:
+                state['limit'] = max(1.0, state['limit'] / 2)
+                state['interval'] = min(THROTTLE_MAX_INTERVAL, max(THROTTLE_MIN_INTERVAL, state['interval'] * 2))
+                state['throttles'] += 1
+                state['calm_after'] = now + max(retry_after or 0, state['interval'])
+            state['next_start'] = max(state['next_start'], now + (retry_after or state['interval']))
+
+    def describe(self, host):
+        """ 'N at a time, one every Xs' for status lines. """
+        with self.cond:
+            state = self._host(host)
+            text = f"{int(state['limit'])} at a time"
+            if state['interval']: text += f", one every {state['interval']:.1f}s"
+            return text
+
+
+# --- HELPER CLASS: Playlist size prefetch ---
+class PlaylistPrefetcher:
+    """
+    Resolves the next `ahead` playlist entries (formats included) on a few background threads
+    ahead of their download, so the run learns real sizes early; each take() moves the window
+    on by one, which keeps memory and the request burst bounded on long playlists. The downloads
+    take() the resolved entries instead of extracting them again, so the prefetch adds no extra
+    extraction, only moves it forward; an entry still waiting in the queue when its download
+    starts is left to the download. Requests go through the run's HostLimiter like the downloads' own.
+    """
+
+    def __init__(self, ydl_opts, jobs, playlist_info, on_size, metrics=None, cancel_token=None,
+                 workers=PREFETCH_WORKERS, limiter=None, ahead=PREFETCH_AHEAD):
+        # Resolving only: no hooks, and failures are counted (and retried) where the download reports them
+        self.ydl_opts = {k: v for k, v in ydl_opts.items() if k not in ('progress_hooks', 'postprocessor_hooks')}
+        self.ydl_opts['logger'] = RunMetrics().logger(quiet=True)
+        self.ydl_opts['ignoreerrors'] = False
+        self.playlist_info = playlist_info
+        self.on_size = on_size
+        self.metrics = metrics or RunMetrics()
+        self.cancel_token = cancel_token or CancelToken()
+        self.limiter = limiter or HostLimiter(workers, self.cancel_token)
+        self.local = threading.local()
+        self.ydls = []
+        self.ahead = ahead
+        self.pending = iter(jobs)
+        self.taken = set()  # entries whose download started before the window reached them
+        self.lock = threading.Lock()
+        self.closed = False
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+        self._fill()
+
+    def _fill(self):
+        with self.lock:
+            while len(self.futures) < self.ahead and not self.closed and not self.cancel_token.cancelled:
+                index, entry = next(self.pending, (None, None))
+                if entry is None: return
+                if index in self.taken: continue
+                self.futures[index] = self.pool.submit(self._resolve, index, entry)
+
+    def _resolve(self, index, entry):
+        if self.cancel_token.cancelled: return None
+        if not hasattr(self.local, 'ydl'):
+            self.local.ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            with self.lock:
+                self.ydls.append(self.local.ydl)
+        extra_info = {**self.playlist_info, 'playlist_index': index}
+        host = urlparse(entry_url(entry)).netloc
+        with self.limiter.slot(host), self.metrics.stage("extract", {**entry, **extra_info}):
+            try:
+                if entry.get('_type') in ('url', 'url_transparent'):
+                    resolved = self.local.ydl.extract_info(entry_url(entry), download=False, extra_info=extra_info)
+                else:
+                    resolved = self.local.ydl.process_ie_result(entry, download=False, extra_info=extra_info)
+            except yt_dlp.utils.DownloadCancelled:
+                raise
+            except Exception as e:
+                kind, retry_after = classify_failure(e)
+                if kind == 'throttled': self.limiter.throttled(host, retry_after)
+                raise
+        self.limiter.success(host)
+        if resolved:
+            self.on_size(index, PlaylistProgress.entry_size(resolved))
+        return resolved, time.time()
+
+    def take(self, index):
+        """ The resolved entry, None when the download has to extract it itself. """
+        with self.lock:
+            future = self.futures.pop(index, None)
+            if future is None: self.taken.add(index)
+        self._fill()
+        if future is None or future.cancel(): return None
+        try:
+            resolved, when = future.result() or (None, 0)
+        except Exception:
+            return None
+        return resolved if time.time() - when < PREFETCH_TTL else None
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        with self.lock:
+            self.futures.clear()
+            ydls, self.ydls = self.ydls, []
+        for ydl in ydls:
+            ydl.close()
+
+
+# --- HELPER CLASS: Download job ---
+class DownloadJob:
+    """
+    Everything one download needs, independent of where it came from (the GUI form, a CLI batch line).
+    mode is 'video', 'audio' or 'album'; quality is the video height or the MP3 bitrate
+    and accepts the GUI labels ('1080p', '192kbps') as well as plain numbers.
+    overwrite decides what happens when the target folder exists: None asks (RunEvents.confirm_overwrite),
+    True writes into it, False skips the job.
+    """
+
+    MODES = ("video", "audio", "album")
+    DEFAULT_QUALITY = {"video": 1080, "audio": 192, "album": 192}
+    FIELDS = ("url", "folder", "mode", "quality", "artist", "album", "year", "cover_art_path", "custom_tracks",
+              "overwrite")
+
+    def __init__(self, url, folder, mode="video", quality=None, artist="", album="", year="",
+                 cover_art_path="", custom_tracks=None, overwrite=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode '{mode}' (expected one of {', '.join(self.MODES)})")
+        self.url = url.strip()
+        self.folder = folder
+        self.mode = mode
+        digits = re.sub(r'\D', '', str(quality or ""))
+        self.quality = int(digits) if digits else self.DEFAULT_QUALITY[mode]
+        self.artist = (artist or "").strip()
+        self.album = (album or "").strip()
+        self.year = str(year or "").strip()
+        self.cover_art_path = cover_art_path or ""
+        self.custom_tracks = list(custom_tracks) if custom_tracks else None
+        self.overwrite = overwrite
+
+    @property
+    def is_album(self):
+        return self.mode == "album"
+
+    @classmethod
+    def from_dict(cls, data, **defaults):
+        """ Builds a job from a dict (e.g. one JSON line of a batch file); unknown keys are rejected. """
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job field(s): {', '.join(sorted(unknown))}")
+        return cls(**{**defaults, **data})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+# --- HELPER CLASS: Download engine ---
+class DownloadEngine:
+    """
+    GUI-free download, naming and tagging pipeline. Holds what jobs share (settings,
+    link info cache, library-wide media index, ffmpeg); every job runs as its own
+    DownloadRun, so several can run at once on different threads.
+    ydl_params are extra YoutubeDL options merged into every download (e.g. quiet for the CLI).
+    metrics_exporter, when set, receives every finished job's result with its RunMetrics.
+    """
+
+    def __init__(self, settings=None, info_cache=None, media_index=None, ffmpeg_path=None, ydl_params=None,
+                 title_rules=None, metrics_exporter=None):
+        self.settings = settings if settings is not None else dict(DEFAULT_SETTINGS)
+        self.info_cache = info_cache or InfoCache()
+        self.media_index = media_index
+        self.ffmpeg_path = ffmpeg_path or get_bin_path("ffmpeg.exe")
+        self.ydl_params = ydl_params or {}
+        # Path of the title rules JSON; re-read by apply_settings so edits apply without a restart
+        self.title_rules = title_rules or title_rules_path()
+        self.titles = TitleNormalizer.from_file(self.title_rules)
+        self.metrics_exporter = metrics_exporter
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """ Engine with the on-disk info cache, media index and metrics export the settings ask for. """
+        if kwargs.get("metrics_exporter") is None:
+            kwargs["metrics_exporter"] = open_metrics_exporter(settings)
+        return cls(settings, InfoCache(disk_dir=info_cache_dir(settings)), open_media_index(settings), **kwargs)
+
+    def apply_settings(self, settings):
+        self.settings = settings
+        self.info_cache.disk_dir = info_cache_dir(settings)
+        self.media_index = open_media_index(settings)
+        self.titles = TitleNormalizer.from_file(self.title_rules)
+        # Keep the running totals of an exporter that stays enabled
+        if not (settings.get("metrics_export") and self.metrics_exporter):
+            self.metrics_exporter = open_metrics_exporter(settings)
+
+    def run(self, job, events=None, cancel_token=None):
+        """ Runs one job to completion on the calling thread and returns its result dict. """
+        result = DownloadRun(self, job, events, cancel_token).execute()
+        if self.metrics_exporter:
+            self.metrics_exporter.export(result)
+        return result
+
+
+# --- HELPER CLASS: One running job ---
+class DownloadRun:
+    """
+    State of a single job while it runs: output folder, tagger, transcode stage, indexes.
+    execute() returns {'url', 'mode', 'status', 'folder', 'files', 'failed_entries', 'error', 'elapsed', 'metrics'}
+    with status 'done', 'cancelled', 'skipped' (folder exists and overwriting was declined) or 'error',
+    failed_entries the playlist entries given up on after their retries ({'index', 'id', 'title', 'url',
+    'attempts', 'error'}; a job with some is still 'done') and metrics from RunMetrics.to_dict().
+    """
+
+    def __init__(self, engine, job, events=None, cancel_token=None):
+        self.engine = engine
+        self.job = job
+        self.events = events or RunEvents()
+        self.cancel_token = cancel_token or CancelToken()
+        self.started = time.time()
+        self.settings = engine.settings
+        self.media_index = engine.media_index
+        self.ffmpeg_path = engine.ffmpeg_path
+        self.folder = None
+        self.files = []
+        self.failed_entries = []
+        self.outputs = set()
+        self.album_tagger = None
+        self.transcoder = None
+        self.streamer = None
+        self.stream_connections = 1
+        self.library = None
+        self.media_variant = None
+        self.metrics = RunMetrics()
+        self.pp_started = {}
+
+    def result(self, status, error=None):
+        return {
+            'url': self.job.url,
+            'mode': self.job.mode,
+            'status': status,
+            'folder': self.folder,
+            'files': list(self.files),
+            'failed_entries': sorted(self.failed_entries, key=lambda e: e['index']),
+            'error': error,
+            'elapsed': round(time.time() - self.started, 3),
+            'metrics': self.metrics.to_dict(),
+        }
+
+    def execute(self):
+        # Cancelled while still waiting in a batch
+        if self.cancel_token.cancelled:
+            return self.result("cancelled")
+
+        try:
+            self.events.status("Checking Paths...", "busy")
+
+            if self.job.is_album and not (self.job.artist and self.job.album):
+                self.events.status("Error: Artist & Album Required", "error")
+                return self.result("error", "artist and album are required")
+
+            os.makedirs(self.job.folder, exist_ok=True)
+            self.folder = self.target_folder()
+
+            syncing = self.settings.get("sync_mode") and LibraryIndex.exists(self.folder)
+            if os.path.exists(self.folder) and not syncing:
+                allowed = self.job.overwrite
+                if allowed is None:
+                    allowed = self.events.confirm_overwrite(os.path.basename(self.folder))
+                if self.cancel_token.cancelled:
+                    self.events.status("Cancelled", "warning")
+                    return self.result("cancelled")
+                if not allowed:
+                    self.events.status("Download Cancelled", "warning")
+                    return self.result("skipped", "folder exists")
+
+        except Exception as e:
+            print(f"Pre-download error: {e}")
+            self.events.status("Error fetching info", "error")
+            return self.result("error", str(e))
+
+        self.events.folder_ready(self.folder)
+        return self.run_download()
+
+    def target_folder(self):
+        """ Album: '<base>/Artist - Album'. Playlists: a folder named after the playlist. Otherwise the base folder. """
+        base_folder = self.job.folder
+        if self.job.is_album:
+            return os.path.join(base_folder, f"{self.job.artist} - {self.job.album}")
+        # Decided on the extraction, not the URL: channel and /videos links and other sites' playlists
+        # have no list= (the run extracts the link anyway, this only does it first)
+        with self.metrics.stage("extract"):
+            info = self.engine.info_cache.get_or_extract(self.job.url)
+        if info.get('_type') == 'playlist':
+            title = info.get('title', 'Unknown Playlist')
+            title = "".join([c for c in title if c.isalpha() or c.isdigit() or c == ' ']).strip()
+            return os.path.join(base_folder, title)
+        return base_folder
+
+    def album_track_name(self, info):
+        """ (title, track_number, filename) for a finished album track, from its yt-dlp info dict. """
+        index = info.get('playlist_index')
+        track_prefix = ""
+        if index:
+            width = len(str(info.get('__last_playlist_index') or info.get('n_entries') or index))
+            track_prefix = str(index).zfill(width)
+
+        custom_tracks = self.job.custom_tracks or []
+        if index and 0 < index <= len(custom_tracks):
+            title = custom_tracks[index - 1]
+        else:
+            title = self.engine.titles.clean(info.get('title') or "Unknown", self.job.artist)
+        title = re.sub(r'^\d+-', '', title).strip() or "Unknown"
+
+        ext = os.path.splitext(info['filepath'])[1]
+        name = yt_dlp.utils.sanitize_filename(title)
+        filename = f"{track_prefix}-{name}{ext}" if track_prefix else f"{name}{ext}"
+        return title, track_prefix, filename
+
+    def open_ydl(self, ydl_opts):
+        """
+        YoutubeDL that hands finished audio downloads to the transcode stage when one is running,
+        and fetches large video streams over several connections when the run allows it.
+        """
+        if self.stream_connections > 1:
+            ydl = SegmentedYoutubeDL(ydl_opts, self.stream_connections, self.cancel_token)
+        else:
+            ydl = yt_dlp.YoutubeDL(ydl_opts)
+        if self.transcoder:
+            ydl.add_post_processor(TrackDonePP(self.transcoder.submit), when='post_process')
+        else:
+            ydl.add_post_processor(TrackDonePP(self.record_track), when='post_process')
+        return ydl
+
+    def record_track(self, info):
+        """ Notes a finished track in the run's file list, the folder's library index and the media index. """
+        if info.get('filepath'):
+            self.files.append(info['filepath'])
+        if not info.get('id'): return
+        try:
+            if self.library:
+                self.library.record(info['id'], info['filepath'], tagged=self.album_tagger is not None,
+                                    playlist_index=info.get('playlist_index'), title=info.get('title'))
+            if self.media_index and self.media_variant:
+                self.media_index.add(info['id'], self.media_variant, info['filepath'],
+                                     album=self.album_tagger is not None)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Index Error: {e}")
+
+    def reuse_from_library(self, info, ydl_opts, skip):
+        """
+        Places entries that already exist elsewhere in the library (same video, same variant)
+        into this run's folder without downloading them. Album copies are retagged for this album;
+        other runs only reuse files without album tags, which they may hardlink.
+        Returns the IDs that were satisfied this way.
+        """
+        if info.get('_type') == 'playlist':
+            jobs, playlist_info = playlist_jobs(info)
+        else:
+            jobs, playlist_info = [(None, info)], {}
+
+        reused = set()
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            for index, entry in jobs:
+                video_id = entry.get('id')
+                if not video_id or video_id in skip: continue
+                found = self.media_index.find(video_id, self.media_variant)
+                if not found: continue
+                src, src_album = found
+                # An album track carries that album's tags; only album runs retag what they reuse
+                if src_album and not self.album_tagger: continue
+
+                track = {**entry, **playlist_info, '_type': 'video', 'ext': os.path.splitext(src)[1][1:]}
+                if index is not None: track['playlist_index'] = index
+                dst = ydl.prepare_filename(track)
+                try:
+                    if os.path.abspath(dst) != src:
+                        # A hardlink would carry this album's tags back into the other folder's file
+                        MediaIndex.materialize(src, dst, link=self.album_tagger is None)
+                    track['filepath'] = dst
+                    if self.album_tagger:
+                        self.album_tagger.tag_info(track, self.album_track_name)
+                    self.record_track(track)
+                    reused.add(video_id)
+                except Exception as e:
+                    print(f"Reuse Error: {e}")
+                    self.metrics.fail("reuse", track)
+
+        if reused:
+            self.events.detail(f"Reused {len(reused)} tracks from earlier downloads")
+        return reused
+
+    def sync_playlist(self, info):
+        """
+        Sync mode: compares the playlist with the folder's index and returns the video IDs
+        that are already present. Album entries that moved or were retitled are retagged
+        and renamed in place instead of downloaded again; entries no longer in the
+        playlist are deleted when pruning is enabled.
+        """
+        jobs, playlist_info = playlist_jobs(info)
+        skip = set()
+
+        for index, entry in jobs:
+            video_id = entry.get('id')
+            path = self.library.existing_path(video_id) if video_id else None
+            if not path: continue
+            skip.add(video_id)
+
+            record = self.library.get(video_id)
+            track = {**playlist_info, 'id': video_id, 'title': entry.get('title'),
+                     'playlist_index': index, 'filepath': path}
+            changed = not record.get('tagged') or record.get('playlist_index') != index \
+                or record.get('title') != entry.get('title')
+            # A playlist that grew past 9 or 99 entries widens the NN- prefix; existing files are re-padded
+            # to the same width so the folder keeps sorting
+            if self.album_tagger and (changed or self.album_track_name(track)[2] != os.path.basename(path)):
+                try:
+                    self.album_tagger.tag_info(track, self.album_track_name)
+                    self.record_track(track)
+                except Exception as e:
+                    print(f"Tag Error: {e}")
+                    self.metrics.fail("tag", track)
+
+        if self.settings.get("sync_prune"):
+            for video_id in self.library.ids() - {entry.get('id') for _, entry in jobs}:
+                self.library.remove(video_id, delete_file=True)
+
+        self.events.detail(f"Sync: {len(skip)} already present, {len(jobs) - len(skip)} to fetch")
+        return skip
+
+    def on_track_transcoded(self, info):
+        """ Transcode worker callback: album tracks are tagged and renamed the moment their audio file exists. """
+        if self.album_tagger:
+            try:
+                self.album_tagger.tag_info(info, self.album_track_name)
+            except Exception as e:
+                print(f"Tag Error: {e}")
+                self.metrics.fail("tag", info)
+        self.record_track(info)
+        self.events.detail(f"Encoded: {os.path.basename(info['filepath'])[:50]}")
+
+    def analyze_loudness(self, folder_path):
+        """
+        ReplayGain pass over every track in the album folder (synced ones included, they are part
+        of the album value). Needs NumPy; without it the album is left as tagged.
+        """
+        try:
+            import loudness
+        except ImportError as e:
+            print(f"Loudness Error: {e}")
+            self.metrics.fail("loudness")
+            return
+        extensions = {"." + spec["ext"] for spec in AUDIO_FORMATS.values()}
+        paths = [os.path.join(folder_path, name) for name in sorted(os.listdir(folder_path))
+                 if os.path.splitext(name)[1].lower() in extensions]
+        if not paths: return
+
+        self.events.status("Analyzing loudness...", "busy")
+        analyses = {}
+        with self.metrics.stage("loudness"):
+            tracks = loudness.analyze_tracks(self.ffmpeg_path, paths, LOUDNESS_WORKERS)
+            try:
+                for done, (path, analysis) in enumerate(tracks, 1):
+                    self.cancel_token.check()
+                    self.events.progress(done / len(paths))
+                    if isinstance(analysis, Exception):
+                        print(f"Loudness Error: {os.path.basename(path)}: {analysis}")
+                        self.metrics.fail("loudness")
+                        continue
+                    analyses[path] = analysis
+            finally:
+                tracks.close()
+
+            for path, values in loudness.replaygain(analyses).items():
+                try:
+                    AlbumTagger.write_loudness(path, values)
+                except Exception as e:
+                    print(f"Loudness Error: {os.path.basename(path)}: {e}")
+                    self.metrics.fail("loudness")
+
+    def start_transcode(self, output):
+        self.media_variant = output.variant
+        self.transcoder = TranscodePool(self.ffmpeg_path, output, self.on_track_transcoded, self.cancel_token,
+                                        metrics=self.metrics)
+        if self.settings.get("stream_transcode"):
+            self.streamer = StreamingTranscoder(self.ffmpeg_path, output, self.cancel_token)
+
+    def run_download(self):
+        url = self.job.url
+        folder_path = self.folder
+        try:
+            self.events.status("Starting Download...", "info")
+
+            ydl_opts = {
+                **self.engine.ydl_params,
+                'outtmpl': f'{folder_path}/%(title)s.%(ext)s',
+                'progress_hooks': [self.progress_hook],
+                'ignoreerrors': True,
+                'ffmpeg_location': self.ffmpeg_path,
+                # ignoreerrors hides failed entries; the logger counts them (and retries) for the metrics
+                'logger': self.metrics.logger(quiet=self.engine.ydl_params.get('quiet', False)),
+                'postprocessor_hooks': [self.postprocessor_hook],
+            }
+            connections = self.settings.get("stream_connections", 1)
+            if connections > 1:
+                # DASH/HLS formats: fetch this many fragments at once
+                ydl_opts['concurrent_fragment_downloads'] = connections
+
+            if self.job.mode == "video":
+                height = self.job.quality
+                self.media_variant = f"mp4-{height}"
+                # Plain http(s) streams are split into byte ranges instead (SegmentedHttpFD)
+                self.stream_connections = connections
+                # Pairs that fit MP4 as they are come first; anything else is merged into MKV
+                # (merge_output_format below) instead of falling back to a single lower-quality file
+                ydl_opts['format'] = (f'bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/'
+                                      f'best[height<={height}][ext=mp4]/'
+                                      f'bestvideo[height<={height}]+bestaudio/best[height<={height}]/best')
+                ydl_opts['merge_output_format'] = 'mp4/mkv'
+            else:
+                output = AudioOutput(self.settings.get("audio_format", "mp3"), self.job.quality)
+                ydl_opts['format'] = output.format_selector()
+                if self.job.is_album:
+                    ydl_opts['outtmpl'] = f'{folder_path}/%(playlist_index)s-%(title)s.%(ext)s'
+                    self.album_tagger = AlbumTagger(self.job.artist, self.job.album, self.job.year,
+                                                    self.job.cover_art_path, metrics=self.metrics,
+                                                    cover_max_size=self.settings.get("cover_max_size",
+                                                                                     COVER_MAX_SIZE))
+                self.start_transcode(output)
+
+            workers = self.settings.get("parallel_downloads", 1)
+            with self.metrics.stage("extract"):
+                info = self.engine.info_cache.get_or_extract(url)
+            # Whatever the URL looks like, a playlist takes the paced and retried per-entry path
+            is_playlist = info.get('_type') == 'playlist'
+            if self.album_tagger and not self.album_tagger.cover and self.settings.get("cover_from_thumbnail"):
+                # Tracks are tagged as they finish, so the cover has to be in place before the first download
+                with self.metrics.stage("tag"):
+                    self.album_tagger.cover = CoverArt.from_thumbnail(info, max_size=self.album_tagger.cover_max_size)
+            skip = set()
+            # The index lives in the folder, so only runs that own theirs keep one (never the base folder)
+            owns_folder = os.path.normpath(folder_path) != os.path.normpath(self.job.folder)
+            if info.get('_type') == 'playlist' and owns_folder \
+                    and (self.job.is_album or self.settings.get("sync_mode")):
+                self.library = LibraryIndex(folder_path)
+                if self.settings.get("sync_mode"):
+                    skip |= self.sync_playlist(info)
+            if self.media_index:
+                skip |= self.reuse_from_library(info, ydl_opts, skip)
+            if skip:
+                ydl_opts['match_filter'] = lambda entry, incomplete=False: \
+                    "Already in library" if entry.get('id') in skip else None
+
+            if is_playlist:
+                # Also with one worker: entries go one by one with whole-job progress instead of per file
+                self.run_parallel_download(info, ydl_opts, workers)
+            elif self.streamer:
+                self.download_entry(ydl_opts, info)
+            else:
+                # Reuse the cached extraction instead of fetching the page again
+                with self.open_ydl(ydl_opts) as ydl:
+                    ydl.process_ie_result(info, download=True)
+
+            self.cancel_token.check()
+            if self.transcoder:
+                self.events.status("Encoding remaining tracks...", "busy")
+                self.transcoder.close()
+            if self.album_tagger and self.settings.get("replaygain"):
+                self.analyze_loudness(folder_path)
+
+            summary = self.metrics.summary()
+            if self.failed_entries:
+                failed = len(self.failed_entries)
+                self.events.status(f"{'Album' if self.job.is_album else 'Playlist'} Complete, "
+                                   f"{failed} track{'s' if failed > 1 else ''} failed", "warning")
+                numbers = ", ".join(str(e['index']) for e in sorted(self.failed_entries, key=lambda e: e['index']))
+                self.events.detail(f"Failed tracks: {numbers}. ({summary})")
+            else:
+                self.events.status("Album Complete!" if self.job.is_album else "Complete!", "done")
+                self.events.detail(f"Files saved successfully. ({summary})" if summary else "Files saved successfully.")
+            return self.result("done")
+
+        except Exception as e:
+            if self.transcoder:
+                self.transcoder.close()
+            if isinstance(e, UserCancelled) or self.cancel_token.cancelled:
+                remove_partial_files(folder_path, self.cancel_token.started, self.outputs)
+                self.events.status("Cancelled", "warning")
+                return self.result("cancelled")
+            self.events.status("Error: Check Console", "error")
+            print(e)
+            return self.result("error", str(e))
+
+    def run_parallel_download(self, info, ydl_opts, workers):
+        """
+        Downloads the entries of an already expanded playlist through a bounded worker pool.
+        Each entry is handed its playlist position, so %(playlist_index)s in the
+        output template resolves exactly as it does in a sequential run.
+        Requests are paced per host (HostLimiter). An entry that fails for a passing reason
+        (throttling, network, server errors) goes to the back of the queue after a jittered
+        backoff, up to "entry_retries" times; the ones that still fail end up in failed_entries.
+        """
+        if info.get('_type') != 'playlist':
+            self.download_entry(ydl_opts, info)
+            return
+
+        jobs, playlist_info = playlist_jobs(info)
+        match_filter = ydl_opts.get('match_filter')
+        if match_filter:
+            jobs = [(index, entry) for index, entry in jobs if match_filter(entry, incomplete=True) is None]
+        if not jobs: return
+
+        progress = PlaylistProgress(jobs)
+        # The prefetch's requests count against the same per-host limit as the downloads
+        limiter = HostLimiter(workers + (PREFETCH_WORKERS if len(jobs) > 1 else 0), self.cancel_token)
+        prefetch = None
+        if len(jobs) > 1:
+            prefetch = PlaylistPrefetcher(ydl_opts, jobs, playlist_info, progress.expect, self.metrics,
+                                          self.cancel_token, limiter=limiter)
+        retries = self.settings.get("entry_retries", 3)
+
+        # One YoutubeDL per worker thread, reused for its entries (building one costs ~0.1s);
+        # its progress hook reports for whichever entry the thread is on. Errors raise here
+        # (no ignoreerrors) so they can be told apart and retried below.
+        local = threading.local()
+        ydls = []
+
+        def download_entry(index, entry, retry):
+            self.cancel_token.check()
+            if not hasattr(local, 'ydl'):
+                opts = dict(ydl_opts)
+                opts['progress_hooks'] = [lambda d: self.parallel_progress_hook(d, local.index, progress, len(jobs))]
+                opts['ignoreerrors'] = False
+                opts['logger'] = self.metrics.logger(quiet=self.engine.ydl_params.get('quiet', False),
+                                                     count_errors=False)
+                local.ydl = self.open_ydl(opts)
+                ydls.append(local.ydl)
+            local.index = index
+            # A retry extracts again: the first attempt's stream URLs may be what failed
+            resolved = prefetch.take(index) if prefetch and not retry else None
+            if match_filter and match_filter(entry, incomplete=True) is not None: return
+            host = urlparse(entry_url(entry)).netloc
+            with limiter.slot(host):
+                try:
+                    self.fetch_entry(local.ydl, entry, {**playlist_info, 'playlist_index': index}, resolved)
+                except yt_dlp.utils.DownloadCancelled:
+                    raise
+                except Exception as e:
+                    kind, retry_after = classify_failure(e)
+                    if kind == 'throttled': limiter.throttled(host, retry_after)
+                    raise
+            limiter.success(host)
+
+        attempts = {}
+        waiting = []  # heap of (due time, index, entry) for entries queued for another try
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(download_entry, index, entry, False): (index, entry) for index, entry in jobs}
+                try:
+                    while futures or waiting:
+                        self.cancel_token.check()
+                        while waiting and waiting[0][0] <= time.time():
+                            _, index, entry = heapq.heappop(waiting)
+                            futures[pool.submit(download_entry, index, entry, True)] = (index, entry)
+                        timeout = min(max(waiting[0][0] - time.time(), 0), 0.5) if waiting else 0.5
+                        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            index, entry = futures.pop(future)
+                            error = future.exception()
+                            if isinstance(error, yt_dlp.utils.DownloadCancelled): raise error
+                            if error is not None:
+                                kind, retry_after = classify_failure(error)
+                                attempts[index] = attempts.get(index, 0) + 1
+                                if kind != 'permanent' and attempts[index] <= retries:
+                                    delay = min(ENTRY_RETRY_MAX, ENTRY_RETRY_BASE * 2 ** (attempts[index] - 1))
+                                    delay = max(delay * random.uniform(0.75, 1.25), retry_after or 0)
+                                    heapq.heappush(waiting, (time.time() + delay, index, entry))
+                                    progress.restart(index)
+                                    self.metrics.count("entry_retries")
+                                    if kind == 'throttled': self.metrics.count("throttled")
+                                    host = urlparse(entry_url(entry)).netloc
+                                    self.events.detail(f"Track {index} {kind}, retrying in {delay:.0f}s "
+                                                       f"({host}: {limiter.describe(host)})")
+                                    continue
+                                self.entry_failed(index, entry, playlist_info, error, attempts[index])
+                            self.parallel_progress_hook({'status': 'finished'}, index, progress, len(jobs),
+                                                        check=False)
+                except BaseException:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+        finally:
+            if prefetch: prefetch.close()
+            for ydl in ydls:
+                ydl.close()
+
+    def entry_failed(self, index, entry, playlist_info, error, attempts):
+        """ Records a playlist entry that is given up on, for the metrics and the job's result. """
+        message = yt_dlp.utils.remove_terminal_sequences(str(error)).replace("ERROR: ", "", 1)
+        print(f"Entry Error: track {index}: {message}")
+        self.metrics.fail("download", {**entry, **playlist_info, 'playlist_index': index})
+        self.failed_entries.append({'index': index, 'id': entry.get('id'), 'title': entry.get('title'),
+                                    'url': entry_url(entry), 'attempts': attempts, 'error': message})
+
+    def download_entry(self, ydl_opts, entry, extra_info=None):
+        """ Downloads one video (flat playlist entry or extracted info dict) with its own YoutubeDL. """
+        match_filter = ydl_opts.get('match_filter')
+        if match_filter and match_filter(entry, incomplete=True) is not None: return
+        with self.open_ydl(ydl_opts) as ydl:
+            self.fetch_entry(ydl, entry, extra_info)
+
+    def fetch_entry(self, ydl, entry, extra_info=None, resolved=None):
+        """
+        Downloads one video, given either a flat playlist entry or an already extracted info dict.
+        resolved is the entry as the prefetch already resolved it, if it did.
+        In streaming mode plain-HTTP audio is piped straight into ffmpeg; anything else
+        (or a failed stream) takes the regular yt-dlp download path.
+        """
+        if not resolved:
+            # Resolved separately from the download so extraction and transfer are timed apart
+            with self.metrics.stage("extract", {**entry, **(extra_info or {})}):
+                if entry.get('_type') in ('url', 'url_transparent'):
+                    resolved = ydl.extract_info(entry_url(entry), download=False, extra_info=extra_info)
+                else:
+                    resolved = ydl.process_ie_result(entry, download=False, extra_info=extra_info)
+        if not resolved: return
+
+        if self.streamer and self.streamer.can_stream(resolved):
+            dst = self.streamer.output.output_path(ydl.prepare_filename(resolved), resolved)
+            try:
+                self.streamer.run(resolved, dst, ydl.params.get('progress_hooks'))
+                self.metrics.count("remuxes" if self.streamer.output.plan(resolved)[1] else "encodes")
+                self.on_track_transcoded(resolved)
+                return
+            except UserCancelled:
+                raise
+            except Exception as e:
+                print(f"Stream Error: {e} - falling back to a regular download")
+                self.metrics.count("stream_fallbacks")
+        ydl.process_ie_result(resolved, download=True)
+
+    def note_output(self, d):
+        """ Remembers which output a progress dict belongs to, for cleaning up after a cancel. """
+        for path in (d.get('info_dict', {}).get('_filename'), d.get('filename')):
+            if path: self.outputs.add(os.path.splitext(path)[0])
+
+    def postprocessor_hook(self, d):
+        """ Times yt-dlp's own ffmpeg steps (merging, audio extraction) as transcode work. """
+        name = d.get('postprocessor') or ""
+        if not name.startswith("FFmpeg"): return
+        key = (threading.get_ident(), name)
+        if d['status'] == 'started':
+            self.pp_started[key] = time.perf_counter()
+        elif d['status'] == 'finished' and key in self.pp_started:
+            self.metrics.add("transcode", time.perf_counter() - self.pp_started.pop(key), d.get('info_dict'))
+
+    def parallel_progress_hook(self, d, index, progress, total, check=True):
+        self.note_output(d)
+        self.metrics.on_progress(d)
+        if check: self.cancel_token.check()
+
+        fraction, finished, speed, eta, done_bytes, total_bytes = progress.update(index, d)
+        if eta is not None and self.transcoder:
+            # The last tracks still have to be encoded after their download, plus whatever is queued
+            backlog = self.transcoder.backlog()
+            if backlog:
+                eta = max(eta + backlog[1], backlog[0])
+        self.events.progress(fraction)
+        self.events.status(f"Downloading: {finished}/{total} tracks done...", "info")
+        # The front end shows the whole-job line (speed, bytes, ETA) its own way
+        self.events.estimate(done_bytes, total_bytes, speed, eta)
+
+    def progress_hook(self, d):
+        self.note_output(d)
+        self.metrics.on_progress(d)
+        self.cancel_token.check()
+
+        if d['status'] == 'downloading':
+            try:
+                p = d.get('_percent_str', '0%').replace('%', '')
+                self.events.progress(float(p) / 100)
+                title = d.get('info_dict', {}).get('title', 'Unknown')
+                self.events.status(f"Downloading: {title[:30]}...")
+                self.events.detail(f"Speed: {d.get('_speed_str')} | ETA: {d.get('_eta_str')}")
+            except:
+                pass
+        elif d['status'] == 'finished':
+            self.events.status("Processing...", "busy")
+
+
+# --- HELPER CLASS: Persistent job queue ---
+class JobQueue:
+    """
+    SQLite list of download jobs with priority, state and last progress, so pending work
+    survives closing the app. States: queued -> running -> done / error / cancelled / skipped.
+    Higher priority runs first, then oldest first. Jobs still marked running when the queue
+    is opened were interrupted and go back to queued; their partial files are resumed (yt-dlp's
+    .part files, or the finished segments of a multi-connection download).
+    """
+
+    FINISHED = ("done", "error", "cancelled", "skipped")
+
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                              "id INTEGER PRIMARY KEY AUTOINCREMENT, job TEXT, priority INTEGER DEFAULT 0, "
+                              "state TEXT DEFAULT 'queued', progress REAL DEFAULT 0, status TEXT DEFAULT '', "
+                              "result TEXT, created REAL, updated REAL)")
+            self.conn.execute("UPDATE jobs SET state = 'queued', status = 'Interrupted' WHERE state = 'running'")
+
+    def add(self, job, priority=0):
+        now = time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO jobs (job, priority, state, created, updated) "
+                                       "VALUES (?, ?, 'queued', ?, ?)",
+                                       (json.dumps(job.to_dict()), priority, now, now))
+            return cursor.lastrowid
+
+    def claim(self):
+        """ Marks the next queued job running and returns (job_id, DownloadJob), or None. """
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT id, job FROM jobs WHERE state = 'queued' "
+                                    "ORDER BY priority DESC, id LIMIT 1").fetchone()
+            if not row: return None
+            self.conn.execute("UPDATE jobs SET state = 'running', updated = ? WHERE id = ?", (time.time(), row[0]))
+        return row[0], DownloadJob.from_dict(json.loads(row[1]))
+
+    def update(self, job_id, progress=None, status=None, job=None):
+        fields = {'progress': progress, 'status': status, 'job': json.dumps(job.to_dict()) if job else None}
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if not fields: return
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)}, updated = ? WHERE id = ?",
+                              (*fields.values(), time.time(), job_id))
+
+    def finish(self, job_id, result):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET state = ?, progress = ?, result = ?, updated = ? WHERE id = ?",
+                              (result['status'], 1.0 if result['status'] == 'done' else 0.0,
+                               json.dumps(result), time.time(), job_id))
+
+    def set_priority(self, job_id, priority):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+
+    def retry(self, job_id):
+        """ Puts a finished job back in the queue. """
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET state = 'queued', progress = 0, status = '', result = NULL "
+                              f"WHERE id = ? AND state IN ({', '.join('?' * len(self.FINISHED))})",
+                              (job_id, *self.FINISHED))
+
+    def remove(self, job_id):
+        """ Deletes a job that is not running. """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM jobs WHERE id = ? AND state != 'running'", (job_id,))
+
+    def clear_finished(self):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM jobs WHERE state IN ({', '.join('?' * len(self.FINISHED))})",
+                              self.FINISHED)
+
+    def jobs(self):
+        """ All jobs in run order: running first, then queued by priority, then finished. """
+        with self.lock:
+            rows = self.conn.execute("SELECT id, job, priority, state, progress, status, result FROM jobs "
+                                     "ORDER BY state != 'running', state != 'queued', priority DESC, id").fetchall()
+        return [{'id': row[0], 'job': json.loads(row[1]), 'priority': row[2], 'state': row[3],
+                 'progress': row[4], 'status': row[5], 'result': json.loads(row[6]) if row[6] else None}
+                for row in rows]
+
+    def count(self, state):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (state,)).fetchone()[0]
+
+
+class QueueRunEvents(RunEvents):
+    """
+    Mirrors a queued job's progress and status into the JobQueue (at most once per `interval`
+    seconds) and passes everything on to the front end's own events.
+    """
+
+    def __init__(self, job_queue, job_id, job, inner=None, interval=1.0):
+        self.queue = job_queue
+        self.job_id = job_id
+        self.job = job
+        self.inner = inner or RunEvents()
+        self.interval = interval
+        self.last_write = 0
+        self.fraction = 0
+        self.text = None
+
+    def _store(self, force=False):
+        now = time.time()
+        if force or now - self.last_write >= self.interval:
+            self.last_write = now
+            self.queue.update(self.job_id, progress=self.fraction, status=self.text)
+
+    def status(self, text, level=None):
+        self.text = text
+        self._store(force=level in ("done", "error", "warning"))
+        self.inner.status(text, level)
+
+    def detail(self, text):
+        self.inner.detail(text)
+
+    def progress(self, fraction):
+        self.fraction = fraction
+        self._store()
+        self.inner.progress(fraction)
+
+    def estimate(self, done_bytes, total_bytes, speed, eta):
+        self.inner.estimate(done_bytes, total_bytes, speed, eta)
+
+    def confirm_overwrite(self, folder_name):
+        return self.inner.confirm_overwrite(folder_name)
+
+    def folder_ready(self, folder):
+        # Once accepted, a resumed job writes into its folder again without asking
+        self.job.overwrite = True
+        self.queue.update(self.job_id, job=self.job)
+        self.inner.folder_ready(folder)
+
+
+# --- HELPER CLASS: Queue runner ---
+class QueueRunner:
+    """
+    Runs jobs from a JobQueue on up to `slots` threads at once. events_for(job_id, job, cancel_token)
+    returns the front end's RunEvents for a job; on_finish(job_id, job, result) is called from the
+    job's thread when it ends. pause() stops new jobs from starting; running ones carry on
+    unless cancelled.
+    """
+
+    def __init__(self, engine, job_queue, slots=1, events_for=None, on_finish=None):
+        self.engine = engine
+        self.queue = job_queue
+        self.slots = slots
+        self.events_for = events_for
+        self.on_finish = on_finish
+        self.tokens = {}
+        self.paused = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._dispatch, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def wake(self):
+        """ Call after adding jobs so a free slot picks them up right away. """
+        with self.cond:
+            self.cond.notify_all()
+
+    def set_slots(self, slots):
+        with self.cond:
+            self.slots = slots
+            self.cond.notify_all()
+
+    def pause(self):
+        with self.cond:
+            self.paused = True
+
+    def resume(self):
+        with self.cond:
+            self.paused = False
+            self.cond.notify_all()
+
+    def cancel(self, job_id):
+        with self.cond:
+            token = self.tokens.get(job_id)
+        if token: token.cancel()
+
+    def cancel_all(self):
+        with self.cond:
+            tokens = list(self.tokens.values())
+        for token in tokens:
+            token.cancel()
+
+    def running(self):
+        with self.cond:
+            return list(self.tokens)
+
+    def busy(self):
+        """ True while a job runs or, unless paused, waits in the queue. """
+        with self.cond:
+            if self.tokens: return True
+            return not self.paused and self.queue.count("queued") > 0
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                claimed = None
+                if not self.paused and len(self.tokens) < self.slots:
+                    claimed = self.queue.claim()
+                if not claimed:
+                    # Timeout as a safety net for jobs added without wake()
+                    self.cond.wait(timeout=1.0)
+                    continue
+                job_id, job = claimed
+                token = self.tokens[job_id] = CancelToken()
+            threading.Thread(target=self._run, args=(job_id, job, token), daemon=True).start()
+
+    def _run(self, job_id, job, token):
+        inner = self.events_for(job_id, job, token) if self.events_for else None
+        try:
+            result = self.engine.run(job, QueueRunEvents(self.queue, job_id, job, inner), token)
+        except Exception as e:
+            print(f"Queue Error: {e}")
+            result = {'url': job.url, 'mode': job.mode, 'status': 'error', 'folder': None, 'files': [],
+                      'error': str(e), 'elapsed': 0}
+        self.queue.finish(job_id, result)
+        with self.cond:
+            self.tokens.pop(job_id, None)
+            self.cond.notify_all()
+        if self.on_finish: self.on_finish(job_id, job, result)
@@ -0,0 +1,35 @@
+"""
+What a running download job reports to its front end. Standard library only, so the desktop app
+can subclass RunEvents before the download engine (yt-dlp & co.) is imported.
+"""
+
+
+# --- HELPER CLASS: Run events ---
+class RunEvents:
+    """
+    Receives what a running job reports. The defaults ignore everything and merge into
+    existing folders; the GUI and the CLI override the parts they show.
+    level is one of None (keep the current look), 'info', 'busy', 'warning', 'done', 'error'.
+    Called from worker threads.
+    """
+
+    def status(self, text, level=None):
+        pass
+
+    def detail(self, text):
+        pass
+
+    def progress(self, fraction):
+        pass
+
+    def estimate(self, done_bytes, total_bytes, speed, eta):
+        """ Whole-job bytes so far and expected, throughput (bytes/s) and seconds left (None if unknown). """
+        pass
+
+    def confirm_overwrite(self, folder_name):
+        """ The target folder already exists and the job leaves it to us; return True to write into it. """
+        return True
+
+    def folder_ready(self, folder):
+        """ The output folder is settled (created or accepted for merging); downloading starts. """
+        pass
@@ -0,0 +1,154 @@
+"""
+EBU R128 loudness of finished tracks, for ReplayGain 2.0 tags.
+
+Each track is decoded by ffmpeg to 48 kHz stereo float PCM and streamed through the
+ITU-R BS.1770 K-weighting filter in chunks (FFT overlap-add, so the filter runs in NumPy
+instead of a per-sample loop). The result per track is the list of 400 ms gating block
+energies plus the sample peak; integrated loudness is gated from those blocks, and the
+album value gates the blocks of every track together, as the standard defines it.
+
+Tracks are analyzed in spawned worker processes (analyze_tracks). The work itself only needs
+NumPy and the standard library, but spawn re-imports the launching script in every worker (as
+__mp_main__, skipping its __main__ block): workers of the app load customtkinter as well, those
+of cli.py the engine and yt-dlp. That import is paid once per worker, not per track.
+"""
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+# ReplayGain 2.0 reference level; Opus R128_* tags are relative to EBU R128's -23 LUFS instead
+REPLAYGAIN_REFERENCE = -18.0
+R128_REFERENCE = -23.0
+
+# BS.1770 K-weighting at 48 kHz: high shelf (head effects) followed by the RLB high-pass
+K_WEIGHTING = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+# Gating blocks are 400 ms with 75% overlap, i.e. sums of four 100 ms segments
+SEGMENT = SAMPLE_RATE // 10
+ABSOLUTE_GATE = 10 ** ((-70 + 0.691) / 10)
+RELATIVE_GATE = 10 ** (-10 / 10)
+
+# The filter's impulse response has decayed below float precision well within IR_LENGTH samples
+IR_LENGTH = 8192
+FFT_SIZE = 1 << 16
+CHUNK = FFT_SIZE - IR_LENGTH + 1
+
+SUBPROCESS_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+def k_weighting_ir(length=IR_LENGTH, grid=1 << 15):
+    """ Impulse response of the K-weighting cascade, from its frequency response. """
+    z = np.exp(-1j * np.pi * np.arange(grid // 2 + 1) / (grid // 2))
+    response = np.ones_like(z)
+    for b, a in K_WEIGHTING:
+        response *= (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
+    return np.fft.irfft(response, grid)[:length]
+
+
+K_WEIGHTING_FFT = np.fft.rfft(k_weighting_ir(), FFT_SIZE)
+
+
+def to_lufs(energy):
+    return -0.691 + 10 * np.log10(energy)
+
+
+def integrated_loudness(blocks):
+    """ Gated loudness (LUFS) of block energies, None for silence. """
+    blocks = blocks[blocks > ABSOLUTE_GATE]
+    if not len(blocks): return None
+    blocks = blocks[blocks > blocks.mean() * RELATIVE_GATE]
+    return float(to_lufs(blocks.mean()))
+
+
+def gating_blocks(segments):
+    """ 400 ms block energies from 100 ms sums of squares. """
+    segments = np.asarray(segments, dtype=np.float64)
+    if len(segments) < 4: return np.zeros(0)
+    sums = np.convolve(segments, np.ones(4), mode="valid")
+    return sums / (4 * SEGMENT)
+
+
+def analyze_track(ffmpeg_path, path):
+    """ {'blocks': gating block energies, 'peak': sample peak} of one audio file. """
+    proc = subprocess.Popen([ffmpeg_path, "-v", "error", "-i", path, "-vn", "-ac", "2", "-ar", str(SAMPLE_RATE),
+                             "-f", "f32le", "pipe:1"],
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            creationflags=SUBPROCESS_FLAGS)
+    frame_bytes = 2 * 4
+    overlap = np.zeros((IR_LENGTH - 1, 2))
+    pending = np.zeros(0)
+    segments = []
+    peak = 0.0
+    try:
+        while True:
+            # A buffered read returns the whole chunk unless the stream has ended
+            data = proc.stdout.read(CHUNK * frame_bytes)
+            if len(data) < frame_bytes: break
+            samples = np.frombuffer(data, dtype="<f4", count=len(data) // frame_bytes * 2)
+            samples = samples.reshape(-1, 2).astype(np.float64)
+            peak = max(peak, float(np.abs(samples).max()))
+
+            # Overlap-add: filtered chunk plus the ringing the previous chunk left behind
+            n = len(samples)
+            filtered = np.fft.irfft(np.fft.rfft(samples, FFT_SIZE, axis=0) * K_WEIGHTING_FFT[:, None],
+                                    FFT_SIZE, axis=0)[:n + IR_LENGTH - 1]
+            filtered[:IR_LENGTH - 1] += overlap
+            overlap = filtered[n:].copy()
+
+            # Channel weights are 1.0 for left and right
+            pending = np.concatenate([pending, np.square(filtered[:n]).sum(axis=1)])
+            complete = len(pending) // SEGMENT * SEGMENT
+            if complete:
+                segments.append(pending[:complete].reshape(-1, SEGMENT).sum(axis=1))
+                pending = pending[complete:]
+    finally:
+        proc.stdout.close()
+        _, error = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {error.decode(errors='replace').strip()[-300:]}")
+    return {'blocks': gating_blocks(np.concatenate(segments) if segments else []), 'peak': peak}
+
+
+def analyze_tracks(ffmpeg_path, paths, workers=None):
+    """
+    Yields (path, analysis or exception) as tracks finish, analyzing them across a process pool.
+    Closing the generator early cancels the tracks that have not started.
+    """
+    # spawn everywhere: forking a process that runs GUI and download threads is not safe
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {pool.submit(analyze_track, ffmpeg_path, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def replaygain(analyses):
+    """
+    ReplayGain values for {path: analysis}: {path: {'track_gain', 'track_peak', 'album_gain', 'album_peak',
+    'r128_track_gain', 'r128_album_gain'}}. Gains are in dB, the R128 ones in the Q7.8 integer form Opus
+    tags use. Silent tracks get no values; they still count for the album peak.
+    """
+    album_lufs = integrated_loudness(np.concatenate([a['blocks'] for a in analyses.values()] or [np.zeros(0)]))
+    album_peak = max((a['peak'] for a in analyses.values()), default=0.0)
+    values = {}
+    for path, analysis in analyses.items():
+        track_lufs = integrated_loudness(analysis['blocks'])
+        if track_lufs is None or album_lufs is None: continue
+        values[path] = {
+            'track_gain': REPLAYGAIN_REFERENCE - track_lufs, 'track_peak': analysis['peak'],
+            'album_gain': REPLAYGAIN_REFERENCE - album_lufs, 'album_peak': album_peak,
+            'r128_track_gain': round((R128_REFERENCE - track_lufs) * 256),
+            'r128_album_gain': round((R128_REFERENCE - album_lufs) * 256),
+        }
+    return values
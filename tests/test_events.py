@@ -0,0 +1,68 @@
+import inspect
+
+import pytest
+
+import cli
+import downloader
+import engine
+from events import RunEvents
+
+HOOKS = [name for name, _ in inspect.getmembers(RunEvents, inspect.isfunction) if not name.startswith("_")]
+
+
+class FakeApp:
+    """ The parts of DownloaderApp that AppRunEvents talks to, recording what was shown. """
+
+    class runner:
+        @staticmethod
+        def running():
+            return [1]
+
+    def __init__(self):
+        self.calls = []
+
+    def set_status(self, text, color=None):
+        self.calls.append(("status", text, color))
+
+    def set_detail(self, text):
+        self.calls.append(("detail", text))
+
+    def set_job_progress(self, job_id, fraction):
+        self.calls.append(("progress", job_id, fraction))
+
+
+@pytest.mark.parametrize("cls", [downloader.AppRunEvents, cli.ConsoleRunEvents, engine.QueueRunEvents])
+def test_front_ends_are_run_events(cls):
+    assert issubclass(cls, RunEvents)
+    for name in HOOKS:
+        assert callable(getattr(cls, name))
+
+
+def test_engine_reexports_run_events():
+    assert engine.RunEvents is RunEvents
+
+
+def test_queue_events_pass_every_hook_to_the_app(tmp_path):
+    job_queue = engine.JobQueue(str(tmp_path / "queue.sqlite"))
+    job = engine.DownloadJob("https://www.youtube.com/watch?v=abc", folder=str(tmp_path))
+    job_id = job_queue.add(job)
+    app = FakeApp()
+    events = engine.QueueRunEvents(job_queue, job_id, job, downloader.AppRunEvents(app, job_id, engine.CancelToken()))
+
+    events.status("Downloading", "busy")
+    events.detail("3 of 12")
+    events.progress(0.25)
+    events.estimate(10 * 1024 * 1024, 40 * 1024 * 1024, 2 * 1024 * 1024, 15)
+    events.folder_ready(str(tmp_path))
+
+    kinds = [call[0] for call in app.calls]
+    assert kinds == ["status", "detail", "progress", "detail"]
+    assert app.calls[2] == ("progress", job_id, 0.25)
+    assert "10.00MiB of ~40.00MiB" in app.calls[3][1] and "ETA" in app.calls[3][1]
+    assert job.overwrite
+
+
+def test_estimate_without_sizes():
+    app = FakeApp()
+    downloader.AppRunEvents(app, 1, engine.CancelToken()).estimate(0, None, 0, None)
+    assert app.calls == [("detail", "Speed: 0.00B/s (combined)")]
@@ -0,0 +1,45 @@
+import pytest
+
+from engine import TitleNormalizer
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Artist - Song (Official Video) [4K]", "Song"),
+    ("artist - Song {HD}", "Song"),
+    ("01-Artist - Song (Lyrics)", "01-Song"),
+    ("Artist | Song (Live)", "Song (Live)"),
+    ("Song (Remastered 2011)", "Song"),
+    ("Song - 2011 Remaster", "Song"),
+    ("Song ft. Bob - Remix", "Song ft. Bob - Remix"),
+])
+def test_default_rules(raw, expected):
+    assert TitleNormalizer().clean(raw, "Artist") == expected
+
+
+@pytest.mark.parametrize("raw, normalized, removed", [
+    ("Song featuring Bob", "Song (feat. Bob)", "Song"),
+    ("Song (feat. Bob)", "Song (feat. Bob)", "Song"),
+    ("Song [ft. Bob] (Remix)", "Song (feat. Bob) (Remix)", "Song (Remix)"),
+    ("Song featuring Bob - Remix", "Song (feat. Bob) - Remix", "Song - Remix"),
+    ("Song ft. Bob | Live", "Song (feat. Bob) | Live", "Song | Live"),
+    ("Song feat. Bob / Acoustic", "Song (feat. Bob) / Acoustic", "Song / Acoustic"),
+    ("Song ft. Jay-Z", "Song (feat. Jay-Z)", "Song"),
+    ("Song feat. AC/DC [Official Video]", "Song (feat. AC/DC)", "Song"),
+])
+def test_feat(raw, normalized, removed):
+    assert TitleNormalizer({"feat": "normalize"}).clean(raw) == normalized
+    assert TitleNormalizer({"feat": "remove"}).clean(raw) == removed
+
+
+def test_rule_overrides():
+    normalizer = TitleNormalizer({"keep_track_prefix": False, "patterns": [[r"\bpt\.? ?(\d)", r"Part \1"]]})
+    assert normalizer.clean("07-Song pt. 2") == "Song Part 2"
+    assert TitleNormalizer({"remaster": "keep"}).clean("Song (Remastered 2011)") == "Song (Remastered 2011)"
+    with pytest.raises(ValueError):
+        TitleNormalizer({"feat": "sometimes"})
+
+
+def test_clean_many_matches_clean():
+    titles = ["A - x (Official Video)", "y ft. B - Live", None]
+    normalizer = TitleNormalizer({"feat": "normalize"})
+    assert normalizer.clean_many(titles, "A") == [normalizer.clean(t or "", "A") for t in titles]